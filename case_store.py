@@ -0,0 +1,258 @@
+#Import packages
+import numpy as np
+from collections.abc import Mapping
+
+#Integer metrics held in the main count array, and float metrics (which may hold NaN or fractions).
+#'reported' is 1 wherever a region appeared in that day's report.
+count_metrics = ('confirmed','deaths','recovered','active','reported')
+float_metrics = ('daily',)
+
+
+class CaseStore(Mapping):
+    """Columnar case data: a regions x dates x metrics array with a region index and a shared date axis.
+
+    Integer metrics live in one int32 array, float metrics (e.g. 'daily', which starts with NaN) in a
+    float64 array of the same shape. For compatibility with the old dict-of-lists layout,
+    store[region][metric] returns that region's row as an array view and store[region]['date'] the dates.
+    """
+
+    def __init__(self, dates, regions=(), counts=count_metrics, floats=float_metrics):
+        self.dates = list(dates)
+        self.count_metrics = list(counts)
+        self.float_metrics = list(floats)
+        self.metric_index = {m:('count',i) for i,m in enumerate(self.count_metrics)}
+        self.metric_index.update({m:('float',i) for i,m in enumerate(self.float_metrics)})
+        self.regions = []
+        self.region_index = {}
+        self._counts = np.zeros((0, len(self.dates), len(self.count_metrics)), dtype=np.int32)
+        self._floats = np.zeros((0, len(self.dates), len(self.float_metrics)), dtype=np.float64)
+        for region in regions: self.add_region(region)
+
+    @classmethod
+    def from_arrays(cls, dates, regions, counts, floats, count_metrics=count_metrics, float_metrics=float_metrics):
+        """Wrap existing arrays (e.g. memory-mapped ones) without copying them."""
+        store = cls(dates, (), count_metrics, float_metrics)
+        store.regions = list(regions)
+        store.region_index = {region:i for i,region in enumerate(store.regions)}
+        store._counts = counts
+        store._floats = floats
+        return store
+
+    #----------------------------------------------------------------------------------------------------
+    # Array access
+    #----------------------------------------------------------------------------------------------------
+
+    @property
+    def counts(self):
+        """int32 array of shape (regions, dates, count metrics)."""
+        return self._counts[:len(self.regions)]
+
+    @property
+    def floats(self):
+        """float64 array of shape (regions, dates, float metrics)."""
+        return self._floats[:len(self.regions)]
+
+    @property
+    def metrics(self):
+        return self.count_metrics + self.float_metrics
+
+    def series(self, metric):
+        """All regions for one metric, as a (regions, dates) view."""
+        kind,i = self.metric_index[metric]
+        if kind == 'count': return self.counts[:,:,i]
+        return self.floats[:,:,i]
+
+    @property
+    def date_positions(self):
+        """{date: index} for every date in the store."""
+        if getattr(self, '_date_positions', None) is None or len(self._date_positions) != len(self.dates):
+            self._date_positions = {date:i for i,date in enumerate(self.dates)}
+        return self._date_positions
+
+    def date_index(self, date):
+        return self.date_positions[date]
+
+    #----------------------------------------------------------------------------------------------------
+    # Growing the store
+    #----------------------------------------------------------------------------------------------------
+
+    def add_region(self, region):
+        """Add a region (if new) and return its integer id."""
+        if region in self.region_index: return self.region_index[region]
+
+        #Grow capacity geometrically so adding regions one at a time stays cheap
+        n = len(self.regions)
+        if n == self._counts.shape[0]:
+            capacity = max(8, 2*n)
+            counts = np.zeros((capacity,)+self._counts.shape[1:], dtype=self._counts.dtype)
+            floats = np.zeros((capacity,)+self._floats.shape[1:], dtype=self._floats.dtype)
+            counts[:n] = self._counts[:n]
+            floats[:n] = self._floats[:n]
+            self._counts, self._floats = counts, floats
+
+        self.regions.append(region)
+        self.region_index[region] = n
+        return n
+
+    def add_metric(self, metric, values=None):
+        """Add a float metric, optionally filled from a (regions, dates) array."""
+        if metric not in self.metric_index:
+            self.float_metrics.append(metric)
+            self.metric_index[metric] = ('float', len(self.float_metrics)-1)
+            pad = np.zeros(self._floats.shape[:2]+(1,), dtype=self._floats.dtype)
+            self._floats = np.concatenate([self._floats, pad], axis=2)
+        if values is not None: self.series(metric)[:] = values
+
+    def set_dates(self, dates, keep=None):
+        """Replace the date axis, keeping the first `keep` days of data and zero-filling the rest."""
+        dates = list(dates)
+        if keep is None: keep = min(len(dates), len(self.dates))
+        counts = np.zeros((self._counts.shape[0], len(dates), self._counts.shape[2]), dtype=self._counts.dtype)
+        floats = np.zeros((self._floats.shape[0], len(dates), self._floats.shape[2]), dtype=self._floats.dtype)
+        counts[:,:keep] = self._counts[:,:keep]
+        floats[:,:keep] = self._floats[:,:keep]
+        self._counts, self._floats = counts, floats
+        self.dates = dates
+        self._date_positions = None
+
+    #----------------------------------------------------------------------------------------------------
+    # Dict-style access, matching the old cases[region][metric] layout
+    #----------------------------------------------------------------------------------------------------
+
+    def __getitem__(self, region):
+        return RegionView(self, self.region_index[region])
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __contains__(self, region):
+        return region in self.region_index
+
+
+class RegionView(Mapping):
+    """One region of a CaseStore, looking like the old {'date':..., 'confirmed':..., ...} dict."""
+
+    def __init__(self, store, idx):
+        self.store = store
+        self.idx = idx
+
+    def __getitem__(self, metric):
+        if metric == 'date': return self.store.dates
+        return self.store.series(metric)[self.idx]
+
+    def __iter__(self):
+        return iter(['date'] + self.store.metrics)
+
+    def __len__(self):
+        return 1 + len(self.store.metrics)
+
+
+class SparseCaseStore(Mapping):
+    """Cumulative counts for many small regions (e.g. US counties), without their leading zero days.
+
+    Each region's series is stored only from its first nonzero day (start[i]) onward: the rows
+    values[offsets[i]:offsets[i+1]] hold dates[start[i]:], one int32 column per metric. Counties
+    that only appear late in the data cost nothing for the days before. labels holds any per-region
+    descriptive columns (e.g. names & codes), as {label: array with one entry per region}.
+    """
+
+    def __init__(self, dates, regions, start, offsets, values, metrics=('confirmed','deaths'), labels=None):
+        self.dates = list(dates)
+        self.regions = list(regions)
+        self.region_index = {region:i for i,region in enumerate(self.regions)}
+        self.metrics = list(metrics)
+        self.metric_index = {m:i for i,m in enumerate(self.metrics)}
+        self.start = start
+        self.offsets = offsets
+        self.values = values
+        self.labels = labels if labels is not None else {}
+
+    @classmethod
+    def from_rows(cls, dates, regions, region_ids, date_ids, values, metrics=('confirmed','deaths'), labels=None):
+        """Build the store from one row per (region, date) reading; duplicate readings are summed.
+
+        values has one column per metric. Rows before a region's first nonzero value are dropped.
+        """
+        n_regions = len(regions); n_dates = len(dates)
+        values = np.asarray(values)
+
+        #First nonzero day of every region (regions without any stay empty)
+        nonzero = values.any(axis=1)
+        start = np.full(n_regions, n_dates, dtype=np.int32)
+        np.minimum.at(start, region_ids[nonzero], date_ids[nonzero].astype(np.int32))
+
+        #Each region holds every day from its start onward
+        offsets = np.zeros(n_regions+1, dtype=np.int64)
+        offsets[1:] = np.cumsum(n_dates - start)
+        keep = date_ids >= start[region_ids]
+        positions = offsets[region_ids[keep]] + date_ids[keep] - start[region_ids[keep]]
+        store = np.zeros((offsets[-1], values.shape[1]), dtype=np.int32)
+        np.add.at(store, positions, values[keep].astype(np.int32))
+        return cls(dates, regions, start, offsets, store, metrics, labels)
+
+    #----------------------------------------------------------------------------------------------------
+    # Array access
+    #----------------------------------------------------------------------------------------------------
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.start.nbytes + self.offsets.nbytes
+
+    def _positions(self):
+        #(region, date) index of every stored row
+        lengths = np.diff(self.offsets)
+        region_ids = np.repeat(np.arange(len(self.regions)), lengths)
+        date_ids = np.arange(self.offsets[-1]) - np.repeat(self.offsets[:-1] - self.start, lengths)
+        return region_ids, date_ids
+
+    def series(self, metric):
+        """All regions for one metric as a dense (regions, dates) int32 array."""
+        dense = np.zeros((len(self.regions), len(self.dates)), dtype=np.int32)
+        region_ids,date_ids = self._positions()
+        dense[region_ids,date_ids] = self.values[:,self.metric_index[metric]]
+        return dense
+
+    def row(self, idx, metric):
+        """One region's full series for one metric."""
+        row = np.zeros(len(self.dates), dtype=np.int32)
+        row[self.start[idx]:] = self.values[self.offsets[idx]:self.offsets[idx+1], self.metric_index[metric]]
+        return row
+
+    def rollup(self, groups, names):
+        """Sum regions into groups (e.g. counties into states), as a CaseStore.
+
+        groups gives every region's group id (-1 to leave a region out), names the group of every id.
+        """
+        region_ids,date_ids = self._positions()
+        group_ids = np.asarray(groups)[region_ids]
+        keep = group_ids >= 0
+        cells = group_ids[keep]*len(self.dates) + date_ids[keep]
+        size = len(names)*len(self.dates)
+
+        store = CaseStore(self.dates, names, counts=self.metrics, floats=())
+        for i,metric in enumerate(self.metrics):
+            totals = np.bincount(cells, weights=self.values[keep,i], minlength=size)
+            store.series(metric)[:] = totals.reshape(len(names), len(self.dates))
+        return store
+
+    #----------------------------------------------------------------------------------------------------
+    # Dict-style access, like CaseStore
+    #----------------------------------------------------------------------------------------------------
+
+    def __getitem__(self, region):
+        idx = self.region_index[region]
+        view = {'date':self.dates}
+        view.update({metric:self.row(idx, metric) for metric in self.metrics})
+        return view
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __contains__(self, region):
+        return region in self.region_index
@@ -0,0 +1,105 @@
+#Import packages & other scripts
+import os, sys
+import tempfile
+import threading
+import datetime as dt
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import csse_mirror
+
+"""
+Checks the pooled report fetching against a local stand-in for the CSSE server, without touching
+the network. Run with: python check_csse_mirror.py
+
+The stand-in serves ten days of small reports. One day always answers 503 (so every retry fails)
+and one day has no report at all (404). The checks are:
+- every served report is mirrored byte for byte
+- the 404 day goes into the negative cache, and the 503 day doesn't; neither stops the run
+- all requests share a pooled connection per worker, rather than opening one each
+- a second run only asks for the day that failed, and mirrors it once it is served
+- parsed reports come back in date order
+"""
+
+#========================================================================================================
+# Stand-in server
+#========================================================================================================
+
+dates = [dt.datetime(2020,1,22) + dt.timedelta(days=i) for i in range(10)]
+unavailable = f"{dates[3]:%m-%d-%Y}.csv"
+absent = f"{dates[5]:%m-%d-%Y}.csv"
+reports = {f"{date:%m-%d-%Y}.csv":f"Province/State,Country/Region,Confirmed\n,Testland,{i}\n".encode()
+           for i,date in enumerate(dates) if f"{date:%m-%d-%Y}.csv" != absent}
+
+requests_seen = []
+connections_seen = set()
+failing = {unavailable}
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        requests_seen.append(name)
+        connections_seen.add(self.client_address)
+        if name in failing: self.reply(503, b'')
+        elif name in reports: self.reply(200, reports[name])
+        else: self.reply(404, b'')
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+#========================================================================================================
+# Checks
+#========================================================================================================
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+
+    with tempfile.TemporaryDirectory() as mirror:
+        workers = 4
+        csse_mirror.configure(base=f"http://127.0.0.1:{server.server_address[1]}/reports",
+                              mirror=mirror, offline_mode=False, max_workers=workers)
+        csse_mirror.backoff = 0
+
+        #First run: one day keeps failing, one has no report
+        paths = csse_mirror.report_manifest(dates[-1])
+        served = [date for date in dates if f"{date:%m-%d-%Y}.csv" in reports and f"{date:%m-%d-%Y}.csv" not in failing]
+        results.append(check(list(paths.keys()) == served, "every served report is mirrored, in date order"))
+        results.append(check(all(open(paths[date], 'rb').read() == reports[f"{date:%m-%d-%Y}.csv"] for date in served),
+                             "mirrored reports match the server byte for byte"))
+        missing = csse_mirror._read_manifest().get('missing', [])
+        results.append(check(absent[:-4] in missing, "a day without a report is cached as missing"))
+        results.append(check(unavailable[:-4] not in missing, "a day the server kept failing isn't cached as missing"))
+        results.append(check(requests_seen.count(unavailable) == csse_mirror.retries + 1,
+                             f"the failing day was retried {csse_mirror.retries} times"))
+        results.append(check(len(connections_seen) <= workers,
+                             f"{len(requests_seen)} requests shared {len(connections_seen)} pooled connections"))
+
+        #Second run: the failing day is back
+        failing.clear(); requests_seen.clear()
+        paths = csse_mirror.report_manifest(dates[-1])
+        results.append(check(requests_seen == [unavailable], "the second run only asks for the day that failed"))
+        results.append(check(dates[3] in paths, "the day that failed is mirrored once it is served"))
+
+        #Parsing on the worker pool keeps date order
+        parsed = list(csse_mirror.stream_reports(paths, lambda path: open(path, 'rb').read(), max_workers=workers))
+        results.append(check([date for date,_ in parsed] == sorted(paths.keys()), "parsed reports come back in date order"))
+
+    server.shutdown()
+    print("All checks passed" if all(results) else "Some checks FAILED")
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#Import packages
+import os, sys
+import logging
+import numpy as np
+import pandas as pd
+
+#========================================================================================================
+# Corrections table
+#========================================================================================================
+
+"""
+Manual corrections to the CSSE data live in corrections.csv, one row per (dataset, date, region, metric).
+Corrections to raw counts (confirmed, deaths, recovered) are applied to a day's aggregated totals,
+before anything is derived from them; corrections to derived metrics (e.g. daily) are applied to the
+case store once those have been computed. Everything applied is recorded in audit_log.
+"""
+
+table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corrections.csv')
+
+#Raw counts, corrected in each day's totals. These are stored as integers, so they can't be blanked out.
+raw_metrics = ('confirmed','deaths','recovered')
+
+#Every correction applied by this process: dicts of dataset, date, region, metric, old and new value
+audit_log = []
+
+_table = None
+
+def load_table(path=None):
+    """Read the corrections table, grouped by (dataset, date) for a single lookup per day.
+
+    Raises ValueError for a nan action on a raw count, which can't hold NaN.
+    """
+    global _table
+    if path is None: path = table_path
+    table = pd.read_csv(path, comment='#', dtype={'value':float, 'stale_within':float})
+    table['date'] = pd.to_datetime(table['date'])
+    blanked = table[(table['action'].isna() | (table['action'] == 'nan')) & table['metric'].isin(raw_metrics)]   #pandas reads nan as NaN
+    if len(blanked) > 0:
+        rows = ', '.join(f"{row.dataset} {row.date:%Y-%m-%d} {row.region} {row.metric}" for row in blanked.itertuples())
+        raise ValueError(f"{path}: the nan action only applies to derived metrics such as daily, "
+                         f"not raw counts ({rows}); use set instead")
+    _table = {(dataset, date.to_pydatetime()):rows.reset_index(drop=True)
+              for (dataset,date),rows in table.groupby(['dataset','date'])}
+    return _table
+
+def corrections_for(dataset, date):
+    """The corrections for one dataset & day, or None if there aren't any."""
+    if _table is None: load_table()
+    return _table.get((dataset, date))
+
+def _record(dataset, date, regions, metrics, old, new):
+    for region,metric,old_value,new_value in zip(regions, metrics, old, new):
+        entry = {'dataset':dataset, 'date':date, 'region':region, 'metric':metric,
+                 'old':old_value, 'new':new_value}
+        audit_log.append(entry)
+        logging.info(f"Correction {dataset} {date:%Y-%m-%d} {region} {metric}: {old_value} -> {new_value}")
+
+def _corrected(action, old, value):
+    #New values for every row of a correction table, all at once
+    return np.where(action == 'set', value,
+           np.where(action == 'add', old + np.nan_to_num(value), np.nan))
+
+
+#========================================================================================================
+# Applying corrections
+#========================================================================================================
+
+def correction_stage(dataset):
+    """A pipeline stage applying the raw-count corrections for a dataset to each day's totals.
+
+    totals is indexed by case store region id with Confirmed/Deaths/Recovered columns, as produced
+    by the aggregation stage. Corrected regions missing from a day's report are added.
+    """
+    def correct_totals(date, totals, cases):
+        table = corrections_for(dataset, date)
+        if table is None: return totals
+        table = table[table['metric'].str.title().isin(totals.columns) & table['region'].isin(cases.region_index.keys())]
+        if len(table) == 0: return totals
+
+        #Make sure every corrected region has a row
+        region_ids = table['region'].map(cases.region_index).to_numpy()
+        missing = [rid for rid in np.unique(region_ids) if rid not in totals.index]
+        if len(missing) > 0:
+            totals = pd.concat([totals, pd.DataFrame(0, index=missing, columns=totals.columns)])
+
+        values = totals.to_numpy(dtype=np.float64, copy=True)
+        rows = totals.index.get_indexer(region_ids)
+        cols = totals.columns.get_indexer(table['metric'].str.title())
+        old = values[rows,cols]
+
+        #Only apply stale-report corrections if the reported total barely moved since the previous day
+        apply = np.ones(len(table), dtype=bool)
+        stale = table['stale_within'].notna().to_numpy()
+        if stale.any():
+            idx = cases.date_index(date)
+            reported = values[rows, totals.columns.get_loc('Confirmed')]
+            previous = cases.series('confirmed')[region_ids, idx-1] if idx > 0 else np.zeros(len(table))
+            apply = ~stale | (np.abs(reported - previous) < table['stale_within'].to_numpy())
+
+        #Scatter all corrections for the day at once
+        new = _corrected(table['action'].to_numpy(), old, table['value'].to_numpy())
+        values[rows[apply],cols[apply]] = new[apply]
+        _record(dataset, date, table['region'][apply], table['metric'][apply], old[apply], new[apply])
+        return pd.DataFrame(values, index=totals.index, columns=totals.columns).astype(totals.dtypes.to_dict())
+
+    return correct_totals
+
+def correct_store(dataset, cases):
+    """Apply corrections for metrics derived in the case store (e.g. daily), for every date it holds."""
+    if _table is None: load_table()
+    tables = [table for (name,date),table in _table.items() if name == dataset and date in cases.date_positions]
+    if len(tables) == 0: return
+    table = pd.concat(tables, ignore_index=True)
+    table = table[table['metric'].isin(cases.float_metrics) & table['region'].isin(cases.region_index.keys())]
+
+    #Scatter each metric's corrections at once
+    for metric,rows in table.groupby('metric'):
+        region_ids = rows['region'].map(cases.region_index).to_numpy()
+        date_ids = np.array([cases.date_positions[date] for date in rows['date'].dt.to_pydatetime()])
+        series = cases.series(metric)
+        old = series[region_ids,date_ids].copy()
+        new = _corrected(rows['action'].to_numpy(), old, rows['value'].to_numpy())
+        series[region_ids,date_ids] = new
+        for date,group in rows.assign(old=old, new=new).groupby('date'):
+            _record(dataset, date.to_pydatetime(), group['region'], group['metric'], group['old'], group['new'])
@@ -0,0 +1,319 @@
+#Import packages
+import os
+import json
+import requests
+import datetime as dt
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+#========================================================================================================
+# Mirror settings
+#========================================================================================================
+
+#Where the CSSE daily reports come from. May be an http(s):// URL, a file:// URL, or a local directory.
+#Can be overridden with the CSSE_BASE_URL environment variable.
+base_url = os.environ.get('CSSE_BASE_URL',
+    'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports')
+
+#Local directory holding one MM-DD-YYYY.csv per daily report.
+#Can be overridden with the CSSE_MIRROR_DIR environment variable.
+mirror_dir = os.environ.get('CSSE_MIRROR_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csse_mirror'))
+
+#Offline mode only reads what is already in the mirror and never touches the network.
+#Can be turned on with CSSE_OFFLINE=1.
+offline = os.environ.get('CSSE_OFFLINE', '0') == '1'
+
+#Reports this many days old or newer may still be revised upstream, so they are refetched.
+#Anything older is historic and is never downloaded twice.
+refresh_days = 2
+
+#How many reports to fetch/parse at once, and how to retry failed downloads.
+#Can be overridden with the CSSE_WORKERS environment variable.
+workers = int(os.environ.get('CSSE_WORKERS', '8'))
+retries = 3
+backoff = 0.5 #seconds; doubles with every retry
+
+#First date with a CSSE daily report
+first_date = dt.datetime(2020,1,22)
+
+#Where the CSSE time series files come from (any kind of location base_url can be).
+#Can be overridden with the CSSE_TIMESERIES_URL environment variable.
+timeseries_url = os.environ.get('CSSE_TIMESERIES_URL',
+    'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series')
+
+#Time series files, as (metric, scope). There is no recovered file for the US.
+timeseries_files = [('confirmed','global'), ('deaths','global'), ('recovered','global'),
+                    ('confirmed','US'), ('deaths','US')]
+
+#Which files datasets are built from: 'daily' reports (one file per day) or the 'timeseries' files
+#(the whole history in a few files). Can be overridden with the CSSE_SOURCE environment variable.
+source = os.environ.get('CSSE_SOURCE', 'daily')
+sources = ('daily', 'timeseries')
+
+
+def configure(base=None, mirror=None, offline_mode=None, max_workers=None, timeseries=None, data_source=None):
+    """Change where reports are read from and mirrored to."""
+    global base_url, mirror_dir, offline, workers, timeseries_url, source
+    if base is not None: base_url = base
+    if mirror is not None: mirror_dir = mirror
+    if offline_mode is not None: offline = offline_mode
+    if max_workers is not None: workers = max(1, int(max_workers))
+    if timeseries is not None: timeseries_url = timeseries
+    if data_source is not None:
+        if data_source not in sources: raise ValueError(f"Unknown data source {data_source!r}, expected one of {sources}")
+        source = data_source
+
+
+#========================================================================================================
+# Paths and URLs
+#========================================================================================================
+
+def report_name(date):
+    return f"{date:%m-%d-%Y}.csv"
+
+def report_url(date):
+    return f"{base_url.rstrip('/')}/{report_name(date)}"
+
+def mirror_path(date):
+    return os.path.join(mirror_dir, report_name(date))
+
+def manifest_path():
+    return os.path.join(mirror_dir, 'manifest.json')
+
+def timeseries_name(metric, scope):
+    return f"time_series_covid19_{metric}_{scope}.csv"
+
+def timeseries_path(metric, scope):
+    return os.path.join(mirror_dir, 'time_series', timeseries_name(metric, scope))
+
+def parse_report_name(name):
+    """Return the date for a MM-DD-YYYY.csv file name, or None if it isn't a daily report."""
+    if not name.endswith('.csv'): return None
+    try:
+        return dt.datetime.strptime(name[:-4], "%m-%d-%Y")
+    except ValueError:
+        return None
+
+def _list_reports(directory):
+    #Dates of all daily reports in a directory, from a single directory listing
+    if not os.path.isdir(directory): return set()
+    dates = set()
+    for name in os.listdir(directory):
+        date = parse_report_name(name)
+        if date is not None: dates.add(date)
+    return dates
+
+def _local_source(url):
+    #Return a filesystem path if the URL points at local files, otherwise None
+    parsed = urlparse(url)
+    if parsed.scheme == 'file': return url2pathname(parsed.path)
+    if parsed.scheme == '' or len(parsed.scheme) == 1: return url #plain path (or Windows drive letter)
+    return None
+
+def is_historic(date, today=None):
+    """Whether a report is old enough that it will no longer change upstream."""
+    if today is None: today = dt.datetime.today()
+    return (today - date) >= dt.timedelta(days=refresh_days)
+
+
+#========================================================================================================
+# Fetching
+#========================================================================================================
+
+def fetch_report(date, session=None):
+    """Make sure the report for a date is in the mirror.
+
+    Returns the local path to the mirrored CSV, None if no report exists for that date, or False if
+    the source couldn't be reached (so the date is simply tried again next run).
+    Historic reports already in the mirror are never refetched.
+    """
+    path = mirror_path(date)
+    if os.path.exists(path) and (offline or is_historic(date)): return path
+    if offline: return None
+    return _fetch(report_url(date), path, session)
+
+def _fetch(url, path, session=None):
+    #Copy or download one file into the mirror. Returns the mirrored path, None if there is none, or
+    #False if the download failed (after any retries) and nothing is mirrored yet.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    local = _local_source(url)
+
+    #Copy from a local source
+    if local is not None:
+        if not os.path.exists(local): return path if os.path.exists(path) else None
+        if os.path.abspath(local) == os.path.abspath(path): return path
+        with open(local, 'rb') as f:
+            content = f.read()
+
+    #Download from a remote source
+    else:
+        getter = session if session is not None else requests
+        try:
+            request = getter.get(url)
+        except requests.RequestException:
+            return path if os.path.exists(path) else False
+        if request.status_code != 200: return path if os.path.exists(path) else None
+        content = request.content
+
+    _write_if_changed(path, content)
+    return path
+
+def _write_if_changed(path, content):
+    #Leave unchanged reports untouched, so their modification times only move when the data does
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content: return
+    with open(path + '.part', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.part', path)
+
+
+def make_session(max_workers=None):
+    """A pooled HTTP session, sized for the worker pool, that retries failed requests with backoff."""
+    if max_workers is None: max_workers = workers
+    retry = Retry(total=retries,
+                  backoff_factor=backoff,
+                  status_forcelist=[429,500,502,503,504],
+                  allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _pool_map(func, items, max_workers=None):
+    #Map over items with a bounded thread pool, keeping the input order
+    if max_workers is None: max_workers = workers
+    if max_workers <= 1 or len(items) <= 1: return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(func, items))
+
+def fetch_reports(dates, session=None, max_workers=None):
+    """Fetch several reports into the mirror at once over a shared session.
+
+    Returns a date-ordered list of (date, result), where result is as returned by fetch_report().
+    """
+    dates = list(dates)
+    if len(dates) == 0: return []
+    if session is None and not offline and _local_source(base_url) is None:
+        with make_session(max_workers) as session:
+            return fetch_reports(dates, session, max_workers)
+    paths = _pool_map(lambda date: fetch_report(date, session=session), dates, max_workers)
+    return list(zip(dates, paths))
+
+def fetch_timeseries(session=None, max_workers=None):
+    """Make sure the time series files are in the mirror.
+
+    They are rewritten upstream every day, so they are refetched on every run (unless offline);
+    unchanged files are left untouched. Returns {(metric, scope): local path} for the files there are.
+    """
+    if session is None and not offline and _local_source(timeseries_url) is None:
+        with make_session(max_workers) as session:
+            return fetch_timeseries(session, max_workers)
+
+    def fetch(key):
+        path = timeseries_path(*key)
+        if offline: return path if os.path.exists(path) else None
+        return _fetch(f"{timeseries_url.rstrip('/')}/{timeseries_name(*key)}", path, session)
+
+    paths = _pool_map(fetch, timeseries_files, max_workers)
+    return {key:path for key,path in zip(timeseries_files, paths) if path}
+
+def stream_reports(paths, reader, max_workers=None, prefetch=None):
+    """Parse mirrored reports on a worker pool, yielding (date, parsed report) in date order.
+
+    paths is a {date: path} dict, as returned by report_manifest(); reader is called on every path.
+    At most `prefetch` reports (default: one per worker) are parsed ahead of the consumer, so memory
+    stays bounded however many reports there are.
+    """
+    if max_workers is None: max_workers = workers
+    if prefetch is None: prefetch = max_workers
+    dates = sorted(paths.keys())
+
+    if max_workers <= 1:
+        for date in dates: yield date, reader(paths[date])
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for date in dates:
+            pending.append((date, pool.submit(reader, paths[date])))
+            if len(pending) >= max(1, prefetch):
+                date,future = pending.popleft()
+                yield date, future.result()
+        while pending:
+            date,future = pending.popleft()
+            yield date, future.result()
+
+
+#========================================================================================================
+# Date manifest
+#========================================================================================================
+
+def _read_manifest():
+    try:
+        with open(manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'missing':[]}
+
+def _write_manifest(manifest):
+    os.makedirs(mirror_dir, exist_ok=True)
+    with open(manifest_path() + '.part', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path() + '.part', manifest_path())
+
+def report_manifest(end_date=None, session=None):
+    """Find which daily reports exist, through end_date (default today).
+
+    Returns a date-ordered dict of {date: mirrored CSV path}. Dates already in the mirror come from a
+    single directory listing, and historic dates known to have no report are kept in a negative cache
+    (manifest.json in the mirror), so only genuinely new days are requested from the source.
+    Each of those requests downloads the report itself, so no file is ever fetched twice.
+    """
+    if end_date is None: end_date = dt.datetime.today()
+    today = dt.datetime.today()
+
+    mirrored = _list_reports(mirror_dir)
+    manifest = _read_manifest()
+    missing = set(manifest.get('missing', []))
+
+    #A local source can be listed directly, so there is nothing to probe
+    local = _local_source(base_url)
+    listed = _list_reports(local) if (local is not None and not offline) else None
+
+    #Work out which dates still need to be fetched
+    candidates = []
+    iter_date = first_date
+    while iter_date <= end_date:
+        strdate = f"{iter_date:%m-%d-%Y}"
+        if offline:
+            pass
+        elif listed is not None:
+            if iter_date in listed and (iter_date not in mirrored or not is_historic(iter_date, today)):
+                candidates.append(iter_date)
+        elif iter_date in mirrored:
+            if not is_historic(iter_date, today): candidates.append(iter_date)
+        elif strdate not in missing:
+            candidates.append(iter_date)
+        iter_date += dt.timedelta(hours=24)
+
+    #Fetch new and still-changing reports
+    #Only dates the source answered for are cached as missing; unreachable ones are retried next run
+    for date,path in fetch_reports(candidates, session=session):
+        if path:
+            mirrored.add(date)
+        elif path is None and is_historic(date, today):
+            missing.add(f"{date:%m-%d-%Y}")
+
+    #Store the negative cache for next time
+    if not offline and sorted(missing) != sorted(manifest.get('missing', [])):
+        manifest['missing'] = sorted(missing, key=lambda x: dt.datetime.strptime(x, "%m-%d-%Y"))
+        _write_manifest(manifest)
+
+    return {date:mirror_path(date) for date in sorted(mirrored) if first_date <= date <= end_date}
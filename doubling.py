@@ -0,0 +1,146 @@
+#Import packages
+import copy
+import numpy as np
+
+def growth_rates(series, lag_days=7):
+    """Inverse doubling time (doublings per day) from lag_days before every date to that date.
+
+    series is a single series or a (regions, dates) array. The result has the same shape, with NaN
+    for the first lag_days dates and wherever the change isn't a ratio of positive counts.
+    lag_days may also be a list of windows: logs are then taken once and shared by every window, and
+    the result gets a leading axis with one entry per window.
+    """
+    values = np.asarray(series, dtype=np.float64)
+    windows = np.atleast_1d(lag_days)
+    rates = np.full((len(windows),)+values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(values)
+        for k,lag in enumerate(windows):
+            if 0 < lag < values.shape[-1]:
+                rates[k,...,lag:] = (logs[...,lag:] - logs[...,:-lag]) / (lag*np.log(2))
+    return rates if np.ndim(lag_days) > 0 else rates[0]
+
+def regression_rates(series, lag_days=7):
+    """Inverse doubling time from a least-squares line through the logs of all lag_days+1 days up to every date.
+
+    Unlike growth_rates, which only looks at the two end days, every day of the window counts, so one
+    bad report can't flip the result. Returns (rates, fit), where fit is the R-squared of each line
+    (NaN where the logs are flat). Both are NaN wherever the window holds a non-positive value.
+    Windows are summed from running cumulative sums, so every region, date & window takes one pass;
+    lag_days may be a list of windows, as for growth_rates.
+    """
+    values = np.asarray(series, dtype=np.float64)
+    windows = np.atleast_1d(lag_days)
+    rates = np.full((len(windows),)+values.shape, np.nan)
+    fit = np.full((len(windows),)+values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(values)
+        valid = np.isfinite(logs)
+
+        #Centering each region's logs keeps the running sums small, so differencing them stays precise.
+        #The mean comes from a masked sum & count, so a region without any positive day needs no warning.
+        logs = np.where(valid, logs, 0)
+        logs = logs - logs.sum(axis=-1, keepdims=True) / np.maximum(valid.sum(axis=-1, keepdims=True), 1)
+        logs = np.where(valid, logs, 0)
+        days = np.arange(values.shape[-1], dtype=np.float64)
+        pad = np.zeros(values.shape[:-1]+(1,))
+        sums = {name:np.concatenate([pad, np.cumsum(terms, axis=-1)], axis=-1)
+                for name,terms in [('y',logs), ('ty',days*logs), ('yy',logs**2), ('n',valid)]}
+
+        for k,lag in enumerate(windows):
+            n = lag + 1
+            if not 0 < lag < values.shape[-1]: continue
+            window = {name:total[...,n:] - total[...,:-n] for name,total in sums.items()}
+            full = window['n'] == n
+
+            #Slope of log counts against days, with days measured from the middle of the window
+            mid = days[lag:] - lag/2
+            stt = n*(n*n - 1)/12
+            sty = window['ty'] - mid*window['y']
+            syy = window['yy'] - window['y']**2/n
+            slope = sty/stt
+            rates[k,...,lag:] = np.where(full, slope/np.log(2), np.nan)
+            fit[k,...,lag:] = np.where(full & (syy > 1e-12), np.clip(slope*sty/syy, 0, 1), np.nan)
+    if np.ndim(lag_days) > 0: return rates, fit
+    return rates[0], fit[0]
+
+#Ways DoublingTimes can estimate growth over a window
+methods = ('endpoints','regression')
+
+
+class DoublingTimes:
+    """Doubling times of many regions over every date and any number of windows, computed in one pass.
+
+    rates[i, t] is region i's inverse doubling time (positive when growing, negative when shrinking)
+    between dates t-lag_days and t, for the default window (the first given, see with_default);
+    window_rates(lag) gives any other window.
+    With method 'endpoints' that's the change between the window's two end days; with 'regression'
+    it's the slope of a least-squares fit over the whole window, and window_fit(lag) gives each R-squared.
+    Regions can be looked up by index or, if names are given, by name.
+    """
+
+    def __init__(self, series, lag_days=7, names=None, method='endpoints'):
+        if method not in methods: raise ValueError(f"Unknown method '{method}'; expected one of {', '.join(methods)}")
+        self.series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+        self.windows = [int(lag) for lag in np.atleast_1d(lag_days)]
+        self.lag_days = self.windows[0]
+        self.method = method
+        self.names = {name:i for i,name in enumerate(names)} if names is not None else {}
+        if method == 'regression':
+            self.all_rates, self.all_fit = regression_rates(self.series, self.windows)
+        else:
+            self.all_rates, self.all_fit = growth_rates(self.series, self.windows), None
+        self.rates = self.all_rates[0]
+
+    def _index(self, region):
+        return self.names[region] if region in self.names else region
+
+    def with_default(self, lag_days):
+        """A copy whose default window (for rates, current, trail, ...) is lag_days, sharing every window's arrays."""
+        view = copy.copy(self)
+        view.lag_days = int(lag_days)
+        view.rates = self.window_rates(view.lag_days)
+        return view
+
+    def window_rates(self, lag_days=None):
+        """The (regions, dates) inverse doubling times for one of the windows."""
+        if lag_days is None: return self.rates
+        return self.all_rates[self.windows.index(lag_days)]
+
+    def window_fit(self, lag_days=None):
+        """The (regions, dates) R-squared of every fit for one of the windows (None for 'endpoints')."""
+        if self.all_fit is None: return None
+        return self.all_fit[self.windows.index(lag_days if lag_days is not None else self.lag_days)]
+
+    def current(self, min_end=1, lag_days=None, min_fit=None):
+        """Inverse doubling time and doubling time of every region on the last date.
+
+        Returns (inverse, doubling, valid). A region is only valid if its last value is above min_end,
+        its value lag_days before is positive, and it changed both over the window and on the window's
+        first day; invalid regions get 999 for both, like the doubling charts always used.
+        Regions without a rate (e.g. a non-positive day inside a regression window), or whose fit's
+        R-squared is below min_fit, are invalid too.
+        """
+        lag = lag_days if lag_days is not None else self.lag_days
+        rates = self.window_rates(lag)
+        end = self.series[:,-1]; start = self.series[:,-lag-1]; day_after_start = self.series[:,-lag]
+        valid = (end > min_end) & (start > 0) & (end != start) & (start != day_after_start) & ~np.isnan(rates[:,-1])
+        if min_fit is not None and self.all_fit is not None:
+            valid &= self.window_fit(lag)[:,-1] >= min_fit
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse = np.where(valid, rates[:,-1], 999)
+            doubling = np.where(valid, 1/rates[:,-1], 999)
+        return inverse, doubling, valid
+
+    def trail(self, region, min_count=100, positive_start=True, over=None, lag_days=None):
+        """A region's inverse doubling times over the dates where it (or region `over`) is above min_count.
+
+        With positive_start, dates whose value lag_days before isn't positive are left out too.
+        The result lines up with the end of the region's series, as plotted by the doubling charts.
+        """
+        lag = lag_days if lag_days is not None else self.lag_days
+        idx = self._index(region)
+        counts = self.series[self._index(over) if over is not None else idx]
+        mask = counts[lag:] > min_count
+        if positive_start: mask &= self.series[idx,:-lag] > 0
+        return self.window_rates(lag)[idx,lag:][mask]
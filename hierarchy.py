@@ -0,0 +1,98 @@
+#Import packages
+import numpy as np
+
+class RegionHierarchy:
+    """Regions nested in levels (county -> state -> country -> world), with named totals.
+
+    Each level maps the regions of one case store to their parent region one level up. Totals are
+    sums over all of a parent's children, optionally leaving some of them out (named exclusion sets
+    such as "world without mainland china"). Every rollup is a single scatter-add over the store, and can
+    be kept in a cache that lives with the store's dataset.
+    """
+
+    def __init__(self):
+        self.levels = {}   #{level: (parent level, function giving the parent of every region in a store, parent names)}
+        self.totals = {}   #{total name: (level, parent region, excluded regions)}
+
+    #----------------------------------------------------------------------------------------------------
+    # Building the hierarchy
+    #----------------------------------------------------------------------------------------------------
+
+    def add_level(self, level, parent_level, parent_of, parents=None):
+        """Add a level. parent_of(cases) returns the parent region of every region of a store.
+
+        If parents is given (a list of parent names, read at every rollup so it can keep growing),
+        parent_of returns indexes into it instead, with -1 for regions without a parent.
+        """
+        self.levels[level] = (parent_level, parent_of, parents)
+
+    def add_total(self, name, level, parent, exclude=()):
+        """Name the total of one parent's children at a level, without the regions in exclude."""
+        self.totals[name] = (level, parent, tuple(exclude))
+
+    def path(self, level):
+        """The levels from this one up to the top of the hierarchy."""
+        levels = [level]
+        while levels[-1] in self.levels: levels.append(self.levels[levels[-1]][0])
+        return levels
+
+    def totals_for(self, level):
+        """Names of every total computed from a level."""
+        return [name for name,(total_level,_,_) in self.totals.items() if total_level == level]
+
+    #----------------------------------------------------------------------------------------------------
+    # Rollups
+    #----------------------------------------------------------------------------------------------------
+
+    def groups(self, level, cases, exclude=()):
+        """The parent regions of a level, and the parent index of every region of a store (-1 if left out)."""
+        _,parent_of,parents = self.levels[level]
+        if parents is None:
+            names,groups = np.unique(np.asarray(parent_of(cases), dtype=object).astype(str), return_inverse=True)
+        else:
+            names,groups = parents, np.array(parent_of(cases), dtype=np.int64)
+        groups = groups.reshape(-1)
+        if len(exclude) > 0: groups[np.isin(np.asarray(list(cases.keys()), dtype=object), exclude)] = -1
+        return list(names), groups
+
+    def rollup_cases(self, level, cases, exclude=(), cache=None):
+        """Every parent region of a sparse store (e.g. counties into states), as a CaseStore of all its metrics.
+
+        cache, if given, is a dict kept with the store's dataset; each rollup is then only summed once.
+        """
+        key = (level, tuple(exclude))
+        if cache is not None and key in cache: return cache[key]
+        names,groups = self.groups(level, cases, exclude)
+        store = cases.rollup(groups, names)
+        if cache is not None: cache[key] = store
+        return store
+
+    def rollup(self, level, cases, metric, exclude=(), cache=None):
+        """Totals of every parent region for one metric.
+
+        Returns (parent names, float64 array of shape (parents, dates)). Regions in exclude are left out.
+        cache works as for rollup_cases.
+        """
+        key = (level, tuple(exclude), metric)
+        if cache is not None and key in cache: return cache[key]
+
+        #Sparse stores sum their own stored rows; dense ones are summed row by row into their parent
+        if hasattr(cases, 'rollup'):
+            store = self.rollup_cases(level, cases, exclude, cache)
+            result = list(store.regions), store.series(metric).astype(np.float64)
+        else:
+            names,groups = self.groups(level, cases, exclude)
+            series = cases.series(metric)
+            keep = groups >= 0
+            totals = np.zeros((len(names), series.shape[1]), dtype=np.float64)
+            np.add.at(totals, groups[keep], series[keep])
+            result = names, totals
+        if cache is not None: cache[key] = result
+        return result
+
+    def total(self, name, cases, metric, cache=None):
+        """One named total, as a float64 series over the store's dates."""
+        level,parent,exclude = self.totals[name]
+        names,totals = self.rollup(level, cases, metric, exclude, cache)
+        if parent not in names: return np.zeros(len(cases.dates))
+        return totals[names.index(parent)]
@@ -14,10 +14,26 @@ print("Import US doubling")
 import plot_us_doubling
 print("Import World doubling")
 import plot_world_doubling
+print("Import Rt")
+import plot_rt
+
+#Read every daily report once; this caches both the US and world datasets
+print("Read case data")
+import read_data
+try: read_data.load_dataset('us')
+except Exception as e: logging.exception("Exception occurred")
 
 plot_types = ['active','deaths','recovered']
 
+#Doubling chart windows (in days). Every window is computed in the same pass over the cached data.
+doubling_windows = [7]
+
 for plot_type in plot_types:
+    #Doubling times for every window, computed in one batched pass per dataset; the charts reuse them
+    for dataset in (['us','world'] if plot_type!="recovered" else ['world']):
+        try: read_data.load_doubling(dataset, plot_type, doubling_windows)
+        except Exception as e: logging.exception("Exception occurred")
+
     if plot_type!="recovered":
         print(f"--> {plot_type} <--")
         print("*** Run US table ***")
@@ -32,12 +48,14 @@ for plot_type in plot_types:
         print("*** Run World chart ***")
         try: plot_world_chart.plot_chart(plot_type)
         except Exception as e: logging.exception("Exception occurred")
-        print("*** Run US doubling ***")
-        try: plot_us_doubling.plot_chart(plot_type)
-        except Exception as e: logging.exception("Exception occurred")
-        print("*** Run World doubling ***")
-        try: plot_world_doubling.plot_chart(plot_type)
-        except Exception as e: logging.exception("Exception occurred")
+        for lag_days in doubling_windows:
+            print("*** Run US doubling ***")
+            try: plot_us_doubling.plot_chart(plot_type, lag_days)
+            except Exception as e: logging.exception("Exception occurred")
+        for lag_days in doubling_windows:
+            print("*** Run World doubling ***")
+            try: plot_world_doubling.plot_chart(plot_type, lag_days)
+            except Exception as e: logging.exception("Exception occurred")
     else:
         print("*** Run World table ***")
         try: plot_world_table.plot_table(plot_type)
@@ -45,6 +63,13 @@ for plot_type in plot_types:
         print("*** Run World chart ***")
         try: plot_world_chart.plot_chart(plot_type)
         except Exception as e: logging.exception("Exception occurred")
-        print("*** Run World doubling ***")
-        try: plot_world_doubling.plot_chart(plot_type)
-        except Exception as e: logging.exception("Exception occurred")
+        for lag_days in doubling_windows:
+            print("*** Run World doubling ***")
+            try: plot_world_doubling.plot_chart(plot_type, lag_days)
+            except Exception as e: logging.exception("Exception occurred")
+
+#Reproduction numbers, from new cases
+for dataset in ['us','world']:
+    print(f"*** Run {dataset} Rt ***")
+    try: plot_rt.plot_chart(dataset)
+    except Exception as e: logging.exception("Exception occurred")
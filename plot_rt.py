@@ -0,0 +1,273 @@
+#Import packages & other scripts
+import os, sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+import read_data
+import ranking
+
+def plot_chart(dataset=None, window=None):
+    #========================================================================================================
+    # User-defined settings
+    #========================================================================================================
+
+    #Whether to save image or display. "directory_path" string is ignored if setting==False.
+    save_image = {'setting': True,
+                  'directory_path': "full_directory_path_here"}
+
+    #Which regions to plot ('us' for states, 'world' for countries)
+    if dataset==None:
+        dataset = "us"
+
+    #Over how many days should Rt be estimated?
+    if window==None:
+        window = 7
+
+    #Plot total numbers?
+    plot_total = True
+
+    #Additional settings
+    settings = {
+        'log_y': True, #Use logarithmic y-axis?
+        'highlight': 'New York' if dataset == 'us' else 'us', #Highlight state or country?
+        'number_of_labels': 10, #Label how many countries with the most new cases?
+        'show_intervals': True, #Show each region's 95% interval?
+        'trail_days': 28, #How many days of trend to draw behind the highlighted region & total?
+    }
+
+
+
+    #========================================================================================================
+    # Get COVID-19 case data
+    #========================================================================================================
+
+    #Z-Order:
+    # 1-intervals
+    # 2-highlighted trend
+    # 3-total trend
+    # 4-highlighted dot
+    # 5-total dot
+    # 6-region dots & labels
+
+    """
+    COVID-19 case data is retrieved from Johns Hopkins CSSE:
+    https://github.com/CSSEGISandData/COVID-19
+    """
+
+    #Case data is cached in memory, so it is only read once per run
+    output = read_data.load_dataset(dataset)
+    dates = output['dates']
+    cases = output['cases']
+
+    #Regions left out, and the total plotted
+    if dataset == 'us':
+        state_abbr = {v: k for k, v in read_data.abbr_state().items()}
+        excluded = read_data.repatriated_locations
+        total_name = 'us without repatriated'; total_label = 'US Total'
+    else:
+        excluded = []
+        total_name = 'world'; total_label = 'World Total'
+
+    #========================================================================================================
+    # Create plot
+    #========================================================================================================
+    max_value = 0; max_rt = 2
+    highlight_color = 'red'; total_color = 'k'; region_color = 'gray'
+
+    #Create figure
+    fig,ax = plt.subplots(figsize=(9,6),dpi=125)
+
+    #Rt of every region and total from new cases, all estimated together and kept for later charts
+    rt = read_data.load_rt(dataset, window)
+    rt_mean, rt_lower, rt_upper, valid = rt['regions'].current()
+    new_cases = rt['regions'].cases[:,-1]
+    keep = valid & ~np.isin(np.array(cases.regions, dtype=object), excluded)
+
+    #Highlighted region, if it has an estimate
+    highlighted = cases.region_index.get(settings.get('highlight', '').lower())
+    if highlighted is not None and not keep[highlighted]: highlighted = None
+    others = keep.copy()
+    if highlighted is not None: others[highlighted] = False
+
+    #Intervals behind the dots
+    if 'show_intervals' in settings.keys() and settings['show_intervals'] == True:
+        ax.hlines(new_cases[keep],rt_lower[keep],rt_upper[keep],color='0.8',lw=0.75,zorder=1)
+
+    #Plot regions: 2-letter abbreviations for states, dots for countries
+    if dataset == 'us':
+        kwargs = {'zorder':6,
+                'color':'k',
+                'ha':'center',
+                'va':'center',
+                'family':'monospace',
+                'fontsize':8
+                }
+        for i in np.flatnonzero(others):
+            ST = state_abbr.get(cases.regions[i].title())
+            if ST is None: print(cases.regions[i].title(),ST); continue
+            ax.text(rt_mean[i],new_cases[i],ST,**kwargs)
+    else:
+        kwargs = {'zorder':6,
+                'color':region_color
+                }
+        ax.scatter(rt_mean[others],new_cases[others],**kwargs)
+
+        #Label the countries with the most new cases
+        kwargs = {'zorder':7,
+                'color':'k',
+                'ha':'left',
+                'va':'center',
+                'family':'monospace',
+                'fontsize':6
+                }
+        for i in ranking.top_k(new_cases, settings.get('number_of_labels', 10), others):
+            name = cases.regions[i].title()
+            if cases.regions[i] in ['us','uk']: name = name.upper()
+            plt.text(rt_mean[i],new_cases[i],' '+name,**kwargs)
+
+    #Output stats to terminal
+    for i in np.flatnonzero(keep):
+        print(f"{cases.regions[i].title()}\t{new_cases[i]:.0f}/day\t{rt_mean[i]:.2f} ({rt_lower[i]:.2f}-{rt_upper[i]:.2f})")
+
+    #Store values useful for the plot axes.
+    if keep.any():
+        max_value = max(max_value,np.max(new_cases[keep]))
+        max_rt = max(max_rt,np.max(rt_mean[keep]))
+
+
+    #Plot highlighted region & its trend
+    if highlighted is not None:
+        highlight_key = cases.regions[highlighted].title()
+        if cases.regions[highlighted] in ['us','uk']: highlight_key = highlight_key.upper()
+        highlight_rt = f"{rt_mean[highlighted]:.2f}"
+        highlight_total = f"{new_cases[highlighted]:.0f}"
+        kwargs = {'zorder':4,
+                'color':highlight_color
+                }
+        ax.scatter(rt_mean[highlighted],new_cases[highlighted],**kwargs)
+
+        trail_rt, trail_cases = rt['regions'].trail(highlighted)
+        trail_rt, trail_cases = trail_rt[-settings['trail_days']:], trail_cases[-settings['trail_days']:]
+        kwargs = {'zorder':2,
+                'color':highlight_color,
+                'lw':1,
+                'markevery':[-7] if len(trail_rt)>6 else [],
+                'ms':2
+                }
+        if len(trail_rt)>1: plt.plot(trail_rt,trail_cases,'-o',**kwargs)
+
+    #Plot total & its trend
+    if plot_total == True:
+        total_mean, _, _, total_valid = rt['totals'].current()
+        total_index = rt['totals'].names[total_name]
+        total_cases = rt['totals'].cases[total_index,-1]
+        if total_valid[total_index]:
+            total_rt_title = f"{total_mean[total_index]:.2f}"
+            kwargs = {'zorder':5,
+                    'color':total_color
+                    }
+            plt.scatter(total_mean[total_index],total_cases,**kwargs)
+
+            trail_rt, trail_cases = rt['totals'].trail(total_name)
+            trail_rt, trail_cases = trail_rt[-settings['trail_days']:], trail_cases[-settings['trail_days']:]
+            kwargs = {'zorder':3,
+                    'lw':1,
+                    'color':total_color,
+                    'markevery':[-7] if len(trail_rt)>6 else [],
+                    'ms':2
+                    }
+            if len(trail_rt)>1: plt.plot(trail_rt,trail_cases,"-o",**kwargs)
+
+            #Store values useful for the plot axes.
+            max_value = max(max_value,total_cases)
+            max_rt = max(max_rt,total_mean[total_index])
+        else:
+            plot_total = False
+
+
+    #Plot grid and legend
+    plt.grid()
+    ax.axvline(1,color='k',lw=1,zorder=1)
+    legend_title = f"Estimated from new cases\nbetween {dates[-window]:%b %d} and {dates[-1]:%b %d}"
+
+    #Blank entries for legend.
+    if highlighted is not None:
+        plt.plot([],[],'-o',color=highlight_color,label=f"{highlight_key} & trend\n     Rt-{highlight_rt}, New cases-{highlight_total}/day")
+    if plot_total == True:
+        plt.plot([],[],'-o',color=total_color,label=f"{total_label} & trend\n     Rt-{total_rt_title}, New cases-{total_cases:.0f}/day")
+    if 'show_intervals' in settings.keys() and settings['show_intervals'] == True:
+        plt.plot([],[],'-',color='0.8',label="95% interval")
+    if dataset == 'us': ax.scatter([],[],color='white',label="Abbreviated States & Territories")
+
+    kwargs = {'loc':2,
+            'prop':{'size':8}
+            }
+    plt.legend(title=legend_title,**kwargs).set_zorder(51)
+
+
+    #Format x-axis: no change at Rt = 1, centered on it
+    right = min(max_rt,4)+0.1
+    plt.xlim(max(0,2-right),right)
+
+
+    #Add logarithmic y-scale
+    if 'log_y' in settings.keys() and settings['log_y'] == True:
+        plt.yscale('log')
+
+        y_locs, y_labels = plt.yticks()
+        for i,loc in enumerate(y_locs):
+            if loc == 1.e+00: y_labels[i] = "1"
+            elif loc == 1.e+01: y_labels[i] = "10"
+            elif loc == 1.e+02: y_labels[i] = "100"
+            elif loc == 1.e+03: y_labels[i] = "1K"
+            elif loc == 1.e+04: y_labels[i] = "10K"
+            elif loc == 1.e+05: y_labels[i] = "100K"
+            elif loc == 1.e+06: y_labels[i] = "1M"
+            elif loc == 1.e+07: y_labels[i] = "10M"
+            elif loc == 1.e+08: y_labels[i] = "100M"
+            elif loc == 1.e+09: y_labels[i] = "1B"
+            elif loc == 1.e+10: y_labels[i] = "10B"
+
+        plt.yticks(y_locs,y_labels)
+
+        plt.ylim(bottom=1)
+
+        if max_value<10: plt.ylim(top=10)
+        elif max_value<100: plt.ylim(top=100)
+        elif max_value<1000: plt.ylim(top=1000)  #1K
+        elif max_value<10000: plt.ylim(top=10000)
+        elif max_value<100000: plt.ylim(top=100000)
+        elif max_value<1000000: plt.ylim(top=1000000) #1M
+        elif max_value<10000000: plt.ylim(top=10000000)
+        elif max_value<100000000: plt.ylim(top=100000000)
+        elif max_value<1000000000: plt.ylim(top=1000000000) #1B
+        elif max_value<10000000000: plt.ylim(top=10000000000)
+
+
+
+    #Plot title
+    add_title = "\n(Non-Repatriated Cases)" if dataset == 'us' else ""
+    plt.title(f"Reproduction Number (Rt) of COVID-19 New Cases {add_title}",fontweight='bold',loc='left')
+    xlabel_text = "<--shrinking\t\t\tgrowing-->".expandtabs()
+    plt.xlabel(xlabel_text,fontweight='bold')
+    plt.ylabel(f"New Cases per Day ({window}-day average)",fontweight='bold')
+
+
+
+    #Plot attribution
+    plt.title(f'Data from Johns Hopkins CSSE\nPlot by Stephen Mullens @srmullens\nCode adapted from Tomer Burg @burgwx',loc='right',fontsize=6)
+
+    #Show plot and close
+    if save_image['setting'] == True:
+        savepath = os.path.join(save_image['directory_path'],f"rt_{dataset}{'' if window == 7 else f'_{window}day'}.png")
+        plt.savefig(savepath,bbox_inches='tight')
+    else:
+        plt.show()
+
+    plt.close()
+
+    #Alert script is done
+    print("Done!")
+
+if __name__ == "__main__":
+        plot_chart()
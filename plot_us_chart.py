@@ -8,8 +8,9 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
 import read_data
+from smoothing import methods as smoothing_methods
 
-def plot_chart(plot_type=None):
+def plot_chart(plot_type=None, smoothing=None, smoothing_days=None):
     #========================================================================================================
     # User-defined settings
     #========================================================================================================
@@ -18,7 +19,8 @@ def plot_chart(plot_type=None):
     save_image = {'setting': True,
                   'directory_path': "full_directory_path_here"}
 
-    #What to plot (confirmed, deaths, recovered, active, daily)
+    #What to plot (confirmed, deaths, recovered, active, daily, or any of those per 100,000 people
+    #as e.g. confirmed_normalized)
     if plot_type==None:
         plot_type = "active"
 
@@ -28,6 +30,11 @@ def plot_chart(plot_type=None):
     #Plot total numbers?
     plot_total = True
 
+    #Smooth the plotted lines? (None, or a method from smoothing.methods: trailing, centered, weekday, ewma)
+    #smoothing_days is the averaging window (or span, for ewma) in days
+    if smoothing_days==None:
+        smoothing_days = 7
+
     #Additional settings
     settings = {
         'log_y': True, #Use logarithmic y-axis?
@@ -40,23 +47,15 @@ def plot_chart(plot_type=None):
     # Get COVID-19 case data
     #========================================================================================================
 
-    repatriated_locations = ['diamond princess',
-                             'grand princess']
-
     """
     COVID-19 case data is retrieved from Johns Hopkins CSSE:
     https://github.com/CSSEGISandData/COVID-19
     """
 
-    #Avoid re-reading case data if it's already stored in memory
-    try:
-        cases
-    except:
-        print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
-
-        output = read_data.read_us()
-        dates = output['dates']
-        cases = output['cases']
+    #Case data is cached in memory, so it is only read once per run
+    output = read_data.load_dataset('us')
+    dates = output['dates']
+    cases = output['cases']
 
     #========================================================================================================
     # Create plot based on type
@@ -66,22 +65,30 @@ def plot_chart(plot_type=None):
     #Create figure
     fig,ax = plt.subplots(figsize=(9,6),dpi=125)
 
-    #Total count
-    total_count = np.array([0.0 for i in cases['diamond princess']['date']])
-    total_count_rp = np.array([0.0 for i in cases['diamond princess']['date']])
+    #Total count, with and without repatriated cases
+    repatriated_locations = read_data.repatriated_locations
+    totals = read_data.load_totals('us', plot_type)
+    total_count = totals['us without repatriated']
+    total_count_rp = totals['us']
 
-    #Iterate through every region
-    sorted_keys = [y[1] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
-    sorted_value = [y[0] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
-    for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
+    #Lines are drawn from the smoothed series if asked for; labels keep the latest reported counts
+    series = cases.series(plot_type); plotted_totals = totals
+    if smoothing is not None:
+        smoothed = read_data.load_smoothed('us', plot_type, smoothing, smoothing_days)
+        series = smoothed['regions']; plotted_totals = smoothed['totals']
+
+    #Per-capita metrics have no meaningful total, and show a decimal place
+    value_format = '.1f' if plot_type.endswith('_normalized') else '.0f'
+    if plot_type.endswith('_normalized'): plot_total = False
+
+    #Iterate through every region, from the highest peak down
+    summary = read_data.load_summary('us', plot_type)
+    top_value = summary.percentile(95)
+    for idx,(key,value) in enumerate(summary.ordered('max')):
 
         #Special handling for Diamond Princess
         if include_repatriated == False and key in repatriated_locations: continue
 
-        #Total count
-        if key not in repatriated_locations: total_count += np.array(cases[key][plot_type])
-        total_count_rp += np.array(cases[key][plot_type])
-
         #Skip plotting if zero
         if value == 0: continue
 
@@ -96,14 +103,14 @@ def plot_chart(plot_type=None):
             pass
         else:
             mtype = '--'; zord=2
-            if np.nanmax(cases[key][plot_type]) > np.percentile(sorted_value,95): mtype = '-o'; zord=3
+            if value > top_value: mtype = '-o'; zord=3
             zord = 22 - idx
 
             #Handle narrow plot
             kwargs = {
                 'linewidth':1.0,
                 'zorder':zord,
-                'label':f"{key.title()} ({cases[key][plot_type][-1]})"
+                'label':f"{key.title()} ({cases[key][plot_type][-1]:{value_format}})"
             }
             if 'condensed_plot' in settings.keys() and settings['condensed_plot'] == True:
                 mtype = '-o'
@@ -116,9 +123,9 @@ def plot_chart(plot_type=None):
                 if 'ms' in kwargs.keys(): kwargs['ms'] = 4
 
             #Plot lines
-            plt.plot(cases[key]['date'],cases[key][plot_type],mtype,**kwargs)
+            plt.plot(cases[key]['date'],series[cases.region_index[key]],mtype,**kwargs)
 
-            max_value = max(max_value,max(cases[key][plot_type]))
+            max_value = max(max_value,np.nanmax(series[cases.region_index[key]]))
 
     #Plot total count
     if plot_total == True:
@@ -128,14 +135,14 @@ def plot_chart(plot_type=None):
             'color':'k',
             'linewidth':2
         }
-        plt.plot(cases[key]['date'],total_count,':',**kwargs)
+        plt.plot(cases[key]['date'],plotted_totals['us without repatriated'],':',**kwargs)
 
         #plt.plot(cases[key]['date'],total_count,':',zorder=2,label=f'Total ({int(total_count[-1])})',color='k',linewidth=2)
         if include_repatriated == True:
             kwargs['label']=f'Total (+ Repatriated)\n({int(total_count_rp[-1])})'
             kwargs['color']='b'
-            plt.plot(cases[key]['date'],total_count_rp,':',**kwargs)
-        max_value = max(max_value,max(total_count))
+            plt.plot(cases[key]['date'],plotted_totals['us'],':',**kwargs)
+        max_value = max(max_value,np.nanmax(plotted_totals['us without repatriated']))
 
     #Format x-ticks
     ax.set_xticks(cases[key]['date'][::7])
@@ -159,10 +166,14 @@ def plot_chart(plot_type=None):
         'active':'Daily COVID-19 Active Cases',
         'daily':'Daily COVID-19 New Cases',
     }
+    for metric in read_data.normalized_metrics:
+        title_string[f"{metric}_normalized"] = f"{title_string[metric]} per 100,000 People"
     add_title = "\n(Non-Repatriated Cases)" if include_repatriated == False else ""
-    plt.title(f"{title_string.get(plot_type)} {add_title}",fontweight='bold',loc='left')
+    smooth_title = f" ({smoothing_methods[smoothing].format(n=smoothing_days)})" if smoothing is not None else ""
+    plt.title(f"{title_string.get(plot_type)}{smooth_title} {add_title}",fontweight='bold',loc='left')
     plt.xlabel("Date",fontweight='bold')
-    plt.ylabel("Cases",fontweight='bold')
+    if plot_type.endswith('_normalized'): plt.ylabel("Cases per 100,000 People",fontweight='bold')
+    else: plt.ylabel("Cases",fontweight='bold')
 
     #Add logarithmic y-scale
     if 'log_y' in settings.keys() and settings['log_y'] == True:
@@ -214,7 +225,7 @@ def plot_chart(plot_type=None):
 
     #Show plot and close
     if save_image['setting'] == True:
-        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_chart_us.png")
+        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_chart_us{'' if smoothing is None else f'_{smoothing}{smoothing_days}'}.png")
         plt.savefig(savepath,bbox_inches='tight')
     else:
         plt.show()
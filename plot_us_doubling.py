@@ -10,7 +10,7 @@ from matplotlib.legend_handler import HandlerLine2D, HandlerTuple
 
 import read_data
 
-def plot_chart(plot_type=None):
+def plot_chart(plot_type=None, lag_days=None, overlay_windows=None, method=None):
     #========================================================================================================
     # User-defined settings
     #========================================================================================================
@@ -19,7 +19,8 @@ def plot_chart(plot_type=None):
     save_image = {'setting': True,
                   'directory_path': "full_directory_path_here"}
 
-    #What to plot (confirmed, confirmed_normalized, deaths, recovered, active, daily)
+    #What to plot (confirmed, deaths, recovered, active, daily, or any of those per 100,000 people
+    #as e.g. confirmed_normalized)
     if plot_type==None:
         plot_type = "active"
 
@@ -30,7 +31,23 @@ def plot_chart(plot_type=None):
     plot_total = True
 
     #Over how many days should the doubling rate be calculated?
-    lag_days = 7
+    if lag_days==None:
+        lag_days = 7
+
+    #Other windows (in days) to overlay as dashed running trends, e.g. [3,14]
+    if overlay_windows==None:
+        overlay_windows = []
+
+    #How is growth over the window estimated? 'endpoints' compares its first & last day, 'regression'
+    #fits a least-squares line through every day of it (so one bad report can't flip a region)
+    if method==None:
+        method = 'endpoints'
+
+    #Smallest count worth trending, and smallest latest value worth a dot (cases, or cases per 100,000
+    #people for *_normalized, which also show a decimal place)
+    min_count = 1 if plot_type.endswith('_normalized') else 100
+    min_end = 0 if plot_type.endswith('_normalized') else 1
+    value_format = '.1f' if plot_type.endswith('_normalized') else '.0f'
 
     #Additional settings
     settings = {
@@ -38,6 +55,7 @@ def plot_chart(plot_type=None):
         'condensed_plot': True, #Condensed plot? (small dots and narrow lines)
         'highlight_state': 'New York', #Highlight state?
         'number_of_state': 20, #Limit number of states plotted?
+        'min_fit': None, #With method 'regression', leave out regions whose fit has an R-squared below this
     }
 
 
@@ -53,9 +71,6 @@ def plot_chart(plot_type=None):
     # 5-total dot
     # 6-state dots
 
-    repatriated_locations = ['diamond princess',
-                             'grand princess']
-
     """
     COVID-19 case data is retrieved from Johns Hopkins CSSE:
     https://github.com/CSSEGISandData/COVID-19
@@ -63,54 +78,45 @@ def plot_chart(plot_type=None):
     abbr_state = read_data.abbr_state()
     state_abbr = {v: k for k, v in abbr_state.items()}
 
-    #Avoid re-reading case data if it's already stored in memory
-    try:
-        cases
-    except:
-        print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
-
-        output = read_data.read_us()
-        dates = output['dates']
-        cases = output['cases']
+    #Case data is cached in memory, so it is only read once per run
+    output = read_data.load_dataset('us')
+    dates = output['dates']
+    cases = output['cases']
 
     #========================================================================================================
     # Create plot based on type
     #========================================================================================================
     max_value = 0; max_doubling = -6; min_doubling = 6
     lag_index = -lag_days - 1
-    highlighted_series = []
+    highlighted_series = []; highlighted_region = None
 
     #Create figure
     fig,ax = plt.subplots(figsize=(9,6),dpi=125)
 
-    #Total count
-    total_count = np.array([0.0 for i in cases['diamond princess']['date']])
-    total_count_rp = np.array([0.0 for i in cases['diamond princess']['date']])
+    #Total count, without repatriated cases
+    repatriated_locations = read_data.repatriated_locations
+    total_count = read_data.load_totals('us', plot_type)['us without repatriated']
 
-    #Iterate through every region
-    sorted_keys = [y[1] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
-    sorted_value = [y[0] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
-    for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
+    #Doubling times of every state and total, over every date
+    #All windows are computed together, and kept for later charts
+    doubling = read_data.load_doubling('us', plot_type, [lag_days]+overlay_windows, method)
+    inverse_doubling_times, doubling_times, _ = doubling['regions'].current(min_end, lag_days=lag_days, min_fit=settings.get('min_fit'))
 
-        end_day = cases[key][plot_type][-1]
-        start_day = cases[key][plot_type][lag_index]
-        day_after_start = cases[key][plot_type][lag_index+1]
+    #Per-capita metrics have no meaningful total
+    if plot_type.endswith('_normalized'): plot_total = False
 
-        doubling_time = 999; inverse_doubling_time = 999
+    #Iterate through every region, from the highest peak down
+    summary = read_data.load_summary('us', plot_type)
+    for idx,(key,value) in enumerate(summary.ordered('max')):
 
-        if end_day>1:
-            if start_day>0 and end_day!=start_day and start_day!=day_after_start:
-                doubling_time = lag_days * np.log(2) / np.log(end_day/start_day)
-                inverse_doubling_time = 1 / doubling_time
+        end_day = cases[key][plot_type][-1]
+        start_day = cases[key][plot_type][lag_index]
+        doubling_time = doubling_times[cases.region_index[key]]
+        inverse_doubling_time = inverse_doubling_times[cases.region_index[key]]
 
         #Special handling for Diamond Princess
         if include_repatriated == False and key in repatriated_locations: continue
 
-        #Total count
-        if key not in repatriated_locations:
-            total_count += np.array(cases[key][plot_type])
-        total_count_rp += np.array(cases[key][plot_type])
-
         #Plot states, including highlighted state if applicable.
         if inverse_doubling_time != 999:
             # Plot highlighted state
@@ -118,12 +124,12 @@ def plot_chart(plot_type=None):
                 highlight_color = 'red'
                 highlight_key = f"{key.title()}"
                 highlight_doubling = f"{doubling_time:.1f}"
-                highlight_total = f"{end_day}"
+                highlight_total = f"{end_day:{value_format}}"
                 kwargs = {'zorder':4,
                         'color':highlight_color
                         }
                 ax.scatter(inverse_doubling_time,end_day,**kwargs)
-                highlighted_series = cases[key][plot_type]
+                highlighted_series = cases[key][plot_type]; highlighted_region = key
             # Plot rest of states
             else:
                 country_text_color = 'k'
@@ -139,7 +145,7 @@ def plot_chart(plot_type=None):
                 ax.text(inverse_doubling_time,end_day,ST,**kwargs)
 
             #Output stats to terminal
-            print(f"{key.title()}\t{start_day}->{end_day}\t{doubling_time:.2f}")
+            print(f"{key.title()}\t{start_day:{value_format}}->{end_day:{value_format}}\t{doubling_time:.2f}")
 
             #Store values useful for the plot axes.
             max_value = max(max_value,end_day)
@@ -153,11 +159,8 @@ def plot_chart(plot_type=None):
     #Calculate highlighted state running doubling time
     if 'highlight_state' in settings.keys():
         highlighted_series_doubling_time = []
-        length_hs = len(highlighted_series)-lag_days
-
-        for i in range(length_hs):
-            if highlighted_series[i+lag_days] > 100 and highlighted_series[i]>0:
-                highlighted_series_doubling_time.append(1/(lag_days * np.log(2) / np.log(highlighted_series[i+lag_days]/highlighted_series[i])))
+        if highlighted_region is not None:
+            highlighted_series_doubling_time = doubling['regions'].trail(cases.region_index[highlighted_region], min_count=min_count, lag_days=lag_days)
 
         #Plot line of highlighted series doubling time history
         if len(highlighted_series_doubling_time)>6:
@@ -179,19 +182,13 @@ def plot_chart(plot_type=None):
         else:
             hc_7 = False
 
-    #Calculate US running doubling time
-    length = len(total_count)-lag_days
-    total_running_doubling_time = []; total_rp_running_doubling_time = []
-
-    for i in range(length):
-        if total_count[i+lag_days] > 100:
-            total_running_doubling_time.append(1/(lag_days * np.log(2) / np.log(total_count[i+lag_days]/total_count[i])))
-            total_rp_running_doubling_time.append(1/(lag_days * np.log(2) / np.log(total_count_rp[i+lag_days]/total_count_rp[i])))
+    #US running doubling time
+    total_running_doubling_time = doubling['totals'].trail('us without repatriated', min_count=100, positive_start=False, lag_days=lag_days)
 
     #Plot total count
     if plot_total == True:
-        total_doubling_time = lag_days*np.log(2)/np.log(total_count[-1]/total_count[lag_index])
-        total_inverse_doubling_time = 1/total_doubling_time
+        total_inverse_doubling_time = doubling['totals'].window_rates(lag_days)[doubling['totals'].names['us without repatriated'],-1]
+        total_doubling_time = 1/total_inverse_doubling_time
 
         total_color = 'k'
         total_doubling_title = f"{total_doubling_time:.1f}"
@@ -215,12 +212,27 @@ def plot_chart(plot_type=None):
         min_doubling = min(min_doubling,1/(1*np.log(2)/np.log(total_count[-1]/total_count[-2])))
 
 
+    #Running trends over the other windows
+    for window in overlay_windows:
+        kwargs = {'zorder':2,
+                'lw':0.75,
+                'alpha':0.7
+                }
+        if highlighted_region is not None:
+            trail = doubling['regions'].trail(cases.region_index[highlighted_region], min_count=min_count, lag_days=window)
+            if len(trail)>1: plt.plot(trail,highlighted_series[-len(trail):],'--',color=highlight_color,label=f"{highlight_key} {window}-day trend",**kwargs)
+        if plot_total == True:
+            trail = doubling['totals'].trail('us without repatriated', min_count=100, positive_start=False, lag_days=window)
+            if len(trail)>1: plt.plot(trail,total_count[-len(trail):],'--',color=total_color,label=f"US Total {window}-day trend",**kwargs)
+
+
     #Plot grid and legend
     plt.grid()
     legend_title = f"Calculated from change\nbetween {cases[key]['date'][lag_index]:%b %d} and {cases[key]['date'][-1]:%b %d}"
+    if method == 'regression': legend_title = f"Fitted to every day\nfrom {cases[key]['date'][lag_index]:%b %d} to {cases[key]['date'][-1]:%b %d}"
 
     #Blank entry for legend.
-    if 'highlight_state' in settings.keys():
+    if highlighted_region is not None:
         plt.plot([],[],'-o',color=highlight_color,label=f"{highlight_key} & trend after 100 cases\n     Time-{highlight_doubling} days, Total-{highlight_total}")
     if plot_total == True:
         plt.plot([],[],'-o',label=f'US Total & trend\n     Time-{total_doubling_title} days, Total-{int(total_count_title)}',color=total_color)
@@ -310,11 +322,13 @@ def plot_chart(plot_type=None):
 
     #Add logarithmic y-scale
     if 'log_y' in settings.keys() and settings['log_y'] == True:
+        if max_value <= 0: plt.ylim(1,10) #Nothing plotted, so nothing to scale from
         plt.yscale('log')
 
         y_locs, y_labels = plt.yticks()
         for i,loc in enumerate(y_locs):
-            if loc == 1.e+00: y_labels[i] = "1"
+            if loc == 1.e-01: y_labels[i] = "0.1"
+            elif loc == 1.e+00: y_labels[i] = "1"
             elif loc == 1.e+01: y_labels[i] = "10"
             elif loc == 1.e+02: y_labels[i] = "100"
             elif loc == 1.e+03: y_labels[i] = "1K"
@@ -328,7 +342,7 @@ def plot_chart(plot_type=None):
 
         plt.yticks(y_locs,y_labels)
 
-        plt.ylim(bottom=1)
+        plt.ylim(bottom=0.1 if plot_type.endswith('_normalized') else 1)
 
         if max_value<10: plt.ylim(top=10)
         elif max_value<100: plt.ylim(top=100)
@@ -351,6 +365,8 @@ def plot_chart(plot_type=None):
         'active':'Doubling Time of Daily COVID-19 Active Cases',
         'daily':'Doubling Time of Daily COVID-19 New Cases',
     }
+    for metric in read_data.normalized_metrics:
+        title_string[f"{metric}_normalized"] = f"{title_string[metric]} per 100,000 People"
     add_title = "\n(Non-Repatriated Cases)" if include_repatriated == False else ""
     plt.title(f"{title_string.get(plot_type)} {add_title}",fontweight='bold',loc='left')
     if left==0:
@@ -358,7 +374,8 @@ def plot_chart(plot_type=None):
     else:
         xlabel_text = "<--faster decrease\t\t\tfaster increase-->".expandtabs()
     plt.xlabel(xlabel_text,fontweight='bold')
-    plt.ylabel("Number of Cases",fontweight='bold')
+    if plot_type.endswith('_normalized'): plt.ylabel("Cases per 100,000 People",fontweight='bold')
+    else: plt.ylabel("Number of Cases",fontweight='bold')
 
 
 
@@ -377,7 +394,11 @@ def plot_chart(plot_type=None):
 
     #Show plot and close
     if save_image['setting'] == True:
-        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_doubling_us.png")
+        #Other windows, overlays and methods each get their own file
+        suffix = '' if lag_days == 7 else f'_{lag_days}day'
+        if len(overlay_windows) > 0: suffix += '_overlay' + '-'.join(str(window) for window in overlay_windows)
+        if method != 'endpoints': suffix += f'_{method}'
+        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_doubling_us{suffix}.png")
         plt.savefig(savepath,bbox_inches='tight')
     else:
         plt.show()
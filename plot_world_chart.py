@@ -8,8 +8,9 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
 import read_data
+from smoothing import methods as smoothing_methods
 
-def plot_chart(plot_type=None):
+def plot_chart(plot_type=None, smoothing=None, smoothing_days=None):
     #========================================================================================================
     # User-defined settings
     #========================================================================================================
@@ -18,7 +19,8 @@ def plot_chart(plot_type=None):
     save_image = {'setting': True,
                   'directory_path': "full_directory_path_here"}
 
-    #What to plot (confirmed, deaths, recovered, active, daily)
+    #What to plot (confirmed, deaths, recovered, active, daily, or any of those per 100,000 people
+    #as e.g. confirmed_normalized)
     if plot_type==None:
         plot_type = "active"
 
@@ -28,6 +30,11 @@ def plot_chart(plot_type=None):
     #Plot total numbers?
     plot_total = True
 
+    #Smooth the plotted lines? (None, or a method from smoothing.methods: trailing, centered, weekday, ewma)
+    #smoothing_days is the averaging window (or span, for ewma) in days
+    if smoothing_days==None:
+        smoothing_days = 7
+
     #Additional settings
     settings = {
         'log_y': True, #Use logarithmic y-axis?
@@ -45,15 +52,10 @@ def plot_chart(plot_type=None):
     https://github.com/CSSEGISandData/COVID-19
     """
 
-    #Avoid re-reading case data if it's already stored in memory
-    try:
-        cases
-    except:
-        print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
-
-        output = read_data.read_world()
-        dates = output['dates']
-        cases = output['cases']
+    #Case data is cached in memory, so it is only read once per run
+    output = read_data.load_dataset('world')
+    dates = output['dates']
+    cases = output['cases']
 
     #========================================================================================================
     # Create plot based on type
@@ -63,23 +65,30 @@ def plot_chart(plot_type=None):
     #Create figure
     fig,ax = plt.subplots(figsize=(9,6),dpi=125)
 
-    #Total count
-    total_count = np.array([0.0 for i in cases['mainland china']['date']])
-    total_count_row = np.array([0.0 for i in cases['mainland china']['date']])
+    #Total count, with and without Mainland China
+    totals = read_data.load_totals('world', plot_type)
+    total_count = totals['world'] if mainland_china == True else totals['world without mainland china']
+    total_count_row = totals['world without mainland china']
 
-    #Iterate through every region
-    sorted_keys = [y[1] for y in sorted([(cases[x][plot_type][-1], x) for x in cases.keys()])][::-1]
-    sorted_value = [y[0] for y in sorted([(cases[x][plot_type][-1], x) for x in cases.keys()])][::-1]
+    #Lines are drawn from the smoothed series if asked for; labels keep the latest reported counts
+    series = cases.series(plot_type); plotted_totals = totals
+    if smoothing is not None:
+        smoothed = read_data.load_smoothed('world', plot_type, smoothing, smoothing_days)
+        series = smoothed['regions']; plotted_totals = smoothed['totals']
+    total_name = 'world' if mainland_china == True else 'world without mainland china'
 
-    for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
+    #Per-capita metrics skip countries without a known population (the summary leaves them out), and have no meaningful total
+    summary = read_data.load_summary('world', plot_type)
+    top_value = summary.percentile(95, by='last')
+    if plot_type.endswith('_normalized'): plot_total = False
+    value_format = '.1f' if plot_type.endswith('_normalized') else '.0f'
+
+    #Iterate through every region, from the highest latest value down
+    for idx,(key,value) in enumerate(summary.ordered('last')):
 
         #Special handling for China
         if mainland_china == False and key == 'mainland china': continue
 
-        #Total count
-        total_count += np.array(cases[key][plot_type])
-        if key != 'mainland china': total_count_row += np.array(cases[key][plot_type])
-
         #Skip plotting if zero
         if value == 0: continue
 
@@ -94,7 +103,7 @@ def plot_chart(plot_type=None):
             pass
         else:
             mtype = '--'; zord=2
-            if np.nanmax(cases[key][plot_type]) > np.percentile(sorted_value,95): mtype = '-o'; zord=3
+            if summary.max[summary.region_index[key]] > top_value: mtype = '-o'; zord=3
             zord = 22 - idx
 
             #Handle US & UK titles
@@ -105,7 +114,7 @@ def plot_chart(plot_type=None):
             kwargs = {
                 'linewidth':1.0,
                 'zorder':zord,
-                'label':f"{loc} ({cases[key][plot_type][-1]})"
+                'label':f"{loc} ({cases[key][plot_type][-1]:{value_format}})"
                 }
             if 'condensed_plot' in settings.keys() and settings['condensed_plot'] == True:
                 mtype = '-o'
@@ -118,9 +127,9 @@ def plot_chart(plot_type=None):
                 if 'ms' in kwargs.keys(): kwargs['ms'] = 4
 
             #Plot lines
-            plt.plot(cases[key]['date'],cases[key][plot_type],mtype,**kwargs)
+            plt.plot(cases[key]['date'],series[cases.region_index[key]],mtype,**kwargs)
 
-            max_value = max(max_value,max(cases[key][plot_type]))
+            max_value = max(max_value,np.nanmax(series[cases.region_index[key]]))
 
     #Plot total count
     if plot_total == True:
@@ -130,14 +139,14 @@ def plot_chart(plot_type=None):
             'color':'k',
             'linewidth':2
         }
-        plt.plot(cases[key]['date'],total_count,':',**kwargs)
+        plt.plot(cases[key]['date'],plotted_totals[total_name],':',**kwargs)
 
         if mainland_china == True:
             kwargs['zorder']=2
             kwargs['label']=f'Total-China ({int(total_count_row[-1])})'
             kwargs['color']='b'
-            plt.plot(cases[key]['date'],total_count_row,':',**kwargs)
-        max_value = max(max_value,max(total_count))
+            plt.plot(cases[key]['date'],plotted_totals['world without mainland china'],':',**kwargs)
+        max_value = max(max_value,np.nanmax(plotted_totals[total_name]))
 
     #Format x-ticks
     ax.set_xticks(cases[key]['date'][::7])
@@ -162,10 +171,14 @@ def plot_chart(plot_type=None):
         'active':'Daily COVID-19 Active Cases',
         'daily':'Daily COVID-19 New Cases',
     }
+    for metric in read_data.normalized_metrics:
+        title_string[f"{metric}_normalized"] = f"{title_string[metric]} per 100,000 People"
     add_title = "\n(Non-Mainland China)" if mainland_china == False else ""
-    plt.title(f"{title_string.get(plot_type)} {add_title}",fontweight='bold',loc='left')
+    smooth_title = f" ({smoothing_methods[smoothing].format(n=smoothing_days)})" if smoothing is not None else ""
+    plt.title(f"{title_string.get(plot_type)}{smooth_title} {add_title}",fontweight='bold',loc='left')
     plt.xlabel("Date",fontweight='bold')
-    plt.ylabel("Number of Cases",fontweight='bold')
+    if plot_type.endswith('_normalized'): plt.ylabel("Cases per 100,000 People",fontweight='bold')
+    else: plt.ylabel("Number of Cases",fontweight='bold')
 
     #Add logarithmic y-scale
     if 'log_y' in settings.keys() and settings['log_y'] == True:
@@ -217,7 +230,7 @@ def plot_chart(plot_type=None):
 
     #Show plot and close
     if save_image['setting'] == True:
-        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_chart_world.png")
+        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_chart_world{'' if smoothing is None else f'_{smoothing}{smoothing_days}'}.png")
         plt.savefig(savepath,bbox_inches='tight')
     else:
         plt.show()
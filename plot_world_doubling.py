@@ -7,11 +7,11 @@ import datetime as dt
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.legend_handler import HandlerLine2D, HandlerTuple
-from operator import itemgetter
 
 import read_data
+import ranking
 
-def plot_chart(plot_type=None):
+def plot_chart(plot_type=None, lag_days=None, overlay_windows=None, method=None):
     #========================================================================================================
     # User-defined settings
     #========================================================================================================
@@ -20,7 +20,8 @@ def plot_chart(plot_type=None):
     save_image = {'setting': True,
                   'directory_path': "/Users/Steve/Desktop/UFlorida/3-Code/COVID/COVID-19"}
 
-    #What to plot (confirmed, confirmed_normalized, deaths, recovered, active, daily)
+    #What to plot (confirmed, deaths, recovered, active, daily, or any of those per 100,000 people
+    #as e.g. confirmed_normalized)
     if plot_type==None:
         plot_type = "recovered"
 
@@ -31,7 +32,23 @@ def plot_chart(plot_type=None):
     plot_total = True
 
     #Over how many days should the doubling rate be calculated?
-    lag_days = 7
+    if lag_days==None:
+        lag_days = 7
+
+    #Other windows (in days) to overlay as dashed running trends, e.g. [3,14]
+    if overlay_windows==None:
+        overlay_windows = []
+
+    #How is growth over the window estimated? 'endpoints' compares its first & last day, 'regression'
+    #fits a least-squares line through every day of it (so one bad report can't flip a region)
+    if method==None:
+        method = 'endpoints'
+
+    #Smallest count worth ranking & trending, and smallest latest value worth a dot (cases, or cases per
+    #100,000 people for *_normalized, which also show a decimal place)
+    min_count = 1 if plot_type.endswith('_normalized') else 100
+    min_end = 0 if plot_type.endswith('_normalized') else 1
+    value_format = '.1f' if plot_type.endswith('_normalized') else '.0f'
 
     #Additional settings
     settings = {
@@ -39,6 +56,7 @@ def plot_chart(plot_type=None):
         'condensed_plot': True, #Condensed plot? (small dots and narrow lines)
         'highlight_country': 'us', #Highlight country?
         'number_of_countries': 20, #Limit number of countries plotted?
+        'min_fit': None, #With method 'regression', leave out regions whose fit has an R-squared below this
     }
 
 
@@ -59,62 +77,53 @@ def plot_chart(plot_type=None):
     https://github.com/CSSEGISandData/COVID-19
     """
 
-    #Avoid re-reading case data if it's already stored in memory
-
-    try:
-        cases
-    except:
-        print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
-        output = read_data.read_world()
-        dates = output['dates']
-        cases = output['cases']
+    #Case data is cached in memory, so it is only read once per run
+    output = read_data.load_dataset('world')
+    dates = output['dates']
+    cases = output['cases']
 
     #========================================================================================================
     # Create plot based on type
     #========================================================================================================
     max_value = 0; max_doubling = -6; min_doubling = 6
     lag_index = -lag_days - 1
-    highlighted_series = []
-    top_cases = [{'cases':0}]*5
-    top_neg_cases = [{'cases':0}]*5
-    top_rates = [{'rate':-20}]*10
-    top_neg_rates = [{'rate':20}]*10
-    country_text_color = 'k'
+    highlighted_series = []; highlighted_region = None
+    country_color = 'gray'; country_text_color = 'k'
 
     #Create figure
     fig,ax = plt.subplots(figsize=(9,6),dpi=125)
 
-    #Total count
-    total_count = np.array([0.0 for i in cases['mainland china']['date']])
-    total_count_raw = np.array([0.0 for i in cases['mainland china']['date']])
+    #Total count, with and without Mainland China
+    totals = read_data.load_totals('world', plot_type)
+    total_name = 'world' if mainland_china == True else 'world without mainland china'
+    total_count = totals[total_name]
+    total_count_raw = totals['world without mainland china']
+
+    #Doubling rates of every country and total, over every date
+    #All windows are computed together, and kept for later charts
+    doubling = read_data.load_doubling('world', plot_type, [lag_days]+overlay_windows, method)
+    inverse_doubling_rates, doubling_rates, _ = doubling['regions'].current(min_end, lag_days=lag_days, min_fit=settings.get('min_fit'))
+    end_days = cases.series(plot_type)[:,-1]
+    plotted = np.zeros(len(cases), dtype=bool)
 
-    #Iterate through every region
-    sorted_keys = [y[1] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
-    sorted_value = [y[0] for y in sorted([(np.nanmax(cases[x][plot_type]), x) for x in cases.keys()])][::-1]
+    #Per-capita metrics skip countries without a known population (the summary leaves them out), and have no meaningful total
+    summary = read_data.load_summary('world', plot_type)
+    if plot_type.endswith('_normalized'): plot_total = False
 
-    for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
+    #Iterate through every region, from the highest peak down
+    for idx,(key,value) in enumerate(summary.ordered('max')):
 
         end_day = cases[key][plot_type][-1]
         start_day = cases[key][plot_type][lag_index]
-        day_after_start = cases[key][plot_type][lag_index+1]
-
-        doubling_rate = 999; inverse_doubling_rate = 999
-
-        if end_day>1:
-            if start_day>0 and end_day!=start_day and start_day!=day_after_start:
-                doubling_rate = lag_days * np.log(2) / np.log(end_day/start_day)
-                inverse_doubling_rate = 1 / doubling_rate
+        doubling_rate = doubling_rates[cases.region_index[key]]
+        inverse_doubling_rate = inverse_doubling_rates[cases.region_index[key]]
 
         #Special handling for China
         if mainland_china == False and key == 'mainland china': continue
 
-        #Total count
-        if key != 'mainland china':
-            total_count_raw += np.array(cases[key][plot_type])
-        total_count += np.array(cases[key][plot_type])
-
         #Plot countries, including highlighted country if applicable.
         if inverse_doubling_rate != 999:
+            plotted[cases.region_index[key]] = True
             if 'highlight_country' in settings.keys() and settings['highlight_country'].lower() == key.lower():
 
                 highlight_color = 'red'
@@ -122,76 +131,19 @@ def plot_chart(plot_type=None):
                 if key.lower() == 'us' or key.lower() == 'uk':
                     highlight_key = f"{key.title().upper()}"
                 highlight_doubling = f"{doubling_rate:.1f}"
-                highlight_total = f"{end_day}"
+                highlight_total = f"{end_day:{value_format}}"
 
                 kwargs = {'zorder':5,
                         'color':highlight_color
                         }
                 ax.scatter(inverse_doubling_rate,end_day,**kwargs)
-                highlighted_series = cases[key][plot_type]
+                highlighted_series = cases[key][plot_type]; highlighted_region = key
             else:
-                country_color = 'gray'
                 kwargs = {'zorder':6,
                         'color':country_color
                 }
                 ax.scatter(inverse_doubling_rate,end_day,**kwargs)
 
-            # Gather countries with top 5 cases, but rate is negative.
-            if end_day>top_neg_cases[-1]['cases'] and inverse_doubling_rate<0:
-                label = {
-                        'rate':inverse_doubling_rate,
-                        'cases':end_day,
-                        'name':key.title()+' '
-                }
-                if label['name']==' Us' or label['name']==' Uk':
-                    label['name']=label['name'].upper()
-                top_neg_cases.insert(0,label)
-                top_neg_cases.pop(-1)
-                if len([i for i in top_neg_cases if i['cases']==0])==0:
-                    top_neg_cases = sorted(top_neg_cases, key=itemgetter('cases'),reverse=False)
-
-            # Gather countries with top 5 cases, but rate is positive.
-            if end_day>top_cases[-1]['cases'] and inverse_doubling_rate>0:
-                label = {
-                        'rate':inverse_doubling_rate,
-                        'cases':end_day,
-                        'name':' '+key.title()
-                }
-                if label['name']==' Us' or label['name']==' Uk':
-                    label['name']=label['name'].upper()
-                top_cases.insert(0,label)
-                top_cases.pop(-1)
-                if len([i for i in top_cases if i['cases']==0])==0:
-                    top_cases = sorted(top_cases, key=itemgetter('cases'),reverse=True)
-
-            # Gather countries with top 5 doubling rates
-            if inverse_doubling_rate>top_rates[-1]['rate'] and end_day>100:
-                label = {
-                        'rate':inverse_doubling_rate,
-                        'cases':end_day,
-                        'name':' '+key.title()
-                }
-                if label['name']==' Us' or label['name']==' Uk':
-                    label['name']=label['name'].upper()
-                top_rates.insert(0,label)
-                top_rates.pop(-1)
-                if len([i for i in top_rates if i['rate']==0])==0:
-                    top_rates = sorted(top_rates, key=itemgetter('rate'),reverse=True)
-
-            # Gather countries with bottom 5 doubling rates (cases going down)
-            if inverse_doubling_rate<top_neg_rates[-1]['rate'] and end_day>100:
-                label = {
-                        'rate':inverse_doubling_rate,
-                        'cases':end_day,
-                        'name':key.title()+' '
-                }
-                if label['name']==' Us' or label['name']==' Uk':
-                    label['name']=label['name'].upper()
-                top_neg_rates.insert(0,label)
-                top_neg_rates.pop(-1)
-                if len([i for i in top_neg_rates if i['rate']==0])==0:
-                    top_neg_rates = sorted(top_neg_rates, key=itemgetter('rate'),reverse=False)
-
             """
             #Label countries reducing totals
             if plot_type=='active' and doubling_rate <= 0:
@@ -207,7 +159,7 @@ def plot_chart(plot_type=None):
             """
 
             #Output stats to terminal
-            print(f"{key.title()}\t{start_day}->{end_day}\t{doubling_rate:.2f}")
+            print(f"{key.title()}\t{start_day:{value_format}}->{end_day:{value_format}}\t{doubling_rate:.2f}")
 
             #Store values useful for the plot axes.
             max_value = max(max_value,end_day)
@@ -215,6 +167,19 @@ def plot_chart(plot_type=None):
             min_doubling = min(min_doubling,inverse_doubling_rate)
 
 
+    #Pick the countries to label: most cases growing & shrinking, and fastest growing & shrinking
+    def region_label(i, right_aligned=False):
+        name = cases.regions[i].title()
+        if cases.regions[i] in ['us','uk']: name = name.upper()
+        return {'rate':inverse_doubling_rates[i],
+                'cases':end_days[i],
+                'name':name+' ' if right_aligned else ' '+name}
+    large = plotted & (end_days > min_count)
+    top_cases = [region_label(i) for i in ranking.top_k(end_days, 5, plotted & (inverse_doubling_rates > 0))]
+    top_neg_cases = [region_label(i, True) for i in ranking.top_k(end_days, 5, plotted & (inverse_doubling_rates < 0))]
+    top_rates = [region_label(i) for i in ranking.top_k(inverse_doubling_rates, 10, large)]
+    top_neg_rates = [region_label(i, True) for i in ranking.bottom_k(inverse_doubling_rates, 10, large)]
+
     #Label countries with top 5 cases
     for case in top_cases: print(case)
     for case in top_neg_cases: print(case)
@@ -243,7 +208,9 @@ def plot_chart(plot_type=None):
     for rate in top_neg_rates: print(rate)
     for i in range(len(top_rates)):
         plt.text(top_rates[i]['rate'],top_rates[i]['cases'],top_rates[i]['name'],**kwargs)
-        if plot_type=='active': plt.text(top_neg_rates[i]['rate'],top_neg_rates[i]['cases'],top_neg_rates[i]['name'],**neg_kwargs)
+    if plot_type=='active':
+        for i in range(len(top_neg_rates)):
+            plt.text(top_neg_rates[i]['rate'],top_neg_rates[i]['cases'],top_neg_rates[i]['name'],**neg_kwargs)
 
     print(f"\nRange: {1/min_doubling:.2f} to {1/max_doubling:.2f} days")
 
@@ -251,11 +218,8 @@ def plot_chart(plot_type=None):
     #Calculate highlighted country running doubling rate
     if 'highlight_country' in settings.keys():
         highlighted_series_doubling_rate = []
-        length_hs = len(highlighted_series)-lag_days
-
-        for i in range(length_hs):
-            if highlighted_series[i+lag_days] > 100 and highlighted_series[i]>0:
-                highlighted_series_doubling_rate.append(1/(lag_days * np.log(2) / np.log(highlighted_series[i+lag_days]/highlighted_series[i])))
+        if highlighted_region is not None:
+            highlighted_series_doubling_rate = doubling['regions'].trail(cases.region_index[highlighted_region], min_count=min_count, lag_days=lag_days)
 
         #Plot line of highlighted series doubling rate history
         if len(highlighted_series_doubling_rate)>6:
@@ -280,20 +244,17 @@ def plot_chart(plot_type=None):
             hc_7 = False
 
 
-    #Calculate world running doubling rate
-    length = len(total_count)-lag_days
-    total_running_doubling_rate = []; total_raw_running_doubling_rate = []
-
-    for i in range(length):
-        if total_count_raw[i+lag_days] > 100:
-            total_raw_running_doubling_rate.append(1/(lag_days * np.log(2) / np.log(total_count_raw[i+lag_days]/total_count_raw[i])))
-            if mainland_china == True:
-                total_running_doubling_rate.append(1/(lag_days * np.log(2) / np.log(total_count[i+lag_days]/total_count[i])))
+    #World running doubling rate, over the days the world outside China is past 100
+    total_raw_running_doubling_rate = doubling['totals'].trail('world without mainland china', min_count=100, positive_start=False, lag_days=lag_days)
+    total_running_doubling_rate = []
+    if mainland_china == True:
+        total_running_doubling_rate = doubling['totals'].trail(total_name, min_count=100, positive_start=False,
+                                                               over='world without mainland china', lag_days=lag_days)
 
     #Plot total count
     if plot_total == True:
-        total_raw_doubling_rate = lag_days*np.log(2)/np.log(total_count_raw[-1]/total_count_raw[lag_index])
-        total_raw_inverse_doubling_rate = 1/total_raw_doubling_rate
+        total_raw_inverse_doubling_rate = doubling['totals'].window_rates(lag_days)[doubling['totals'].names['world without mainland china'],-1]
+        total_raw_doubling_rate = 1/total_raw_inverse_doubling_rate
 
         total_raw_color = 'b'
         total_raw_doubling_title = f"{total_raw_doubling_rate:.1f}"
@@ -314,8 +275,8 @@ def plot_chart(plot_type=None):
         #plt.plot(total_raw_running_doubling_rate,total_count_raw[-len(total_raw_running_doubling_rate):],"-o",lw=1,zorder=3,color=total_raw_color,markevery=[-7],ms=2)
 
         if mainland_china == True:
-            total_doubling_rate = lag_days*np.log(2)/np.log(total_count[-1]/total_count[lag_index])
-            total_inverse_doubling_rate = 1/total_doubling_rate
+            total_inverse_doubling_rate = doubling['totals'].window_rates(lag_days)[doubling['totals'].names[total_name],-1]
+            total_doubling_rate = 1/total_inverse_doubling_rate
 
             total_color = 'k'
             total_doubling_title = f"{total_doubling_rate:.1f}"
@@ -341,12 +302,27 @@ def plot_chart(plot_type=None):
         min_doubling = min(min_doubling,1/(1*np.log(2)/np.log(total_count[-1]/total_count[-2])))
 
 
+    #Running trends over the other windows
+    for window in overlay_windows:
+        kwargs = {'zorder':2,
+                'lw':0.75,
+                'alpha':0.7
+                }
+        if highlighted_region is not None:
+            trail = doubling['regions'].trail(cases.region_index[highlighted_region], min_count=min_count, lag_days=window)
+            if len(trail)>1: plt.plot(trail,highlighted_series[-len(trail):],'--',color=highlight_color,label=f"{highlight_key} {window}-day trend",**kwargs)
+        if plot_total == True:
+            trail = doubling['totals'].trail('world without mainland china', min_count=100, positive_start=False, lag_days=window)
+            if len(trail)>1: plt.plot(trail,total_count_raw[-len(trail):],'--',color=total_raw_color,label=f"World Total (no China) {window}-day trend",**kwargs)
+
+
     #Plot grid and legend
     plt.grid()
     legend_title = f"Calculated from change\nbetween {cases[key]['date'][lag_index]:%b %d} and {cases[key]['date'][-1]:%b %d}"
+    if method == 'regression': legend_title = f"Fitted to every day\nfrom {cases[key]['date'][lag_index]:%b %d} to {cases[key]['date'][-1]:%b %d}"
 
     #Blank entries for legend.
-    if 'highlight_country' in settings.keys():
+    if highlighted_region is not None:
         plt.plot([],[],'-o',color=highlight_color,label=f"{highlight_key} & trend after 100 cases\n     Time-{highlight_doubling} days, Total-{highlight_total}")
     if plot_total == True:
         plt.plot([],[],'-o',label=f'World Total (no China) & trend\n     Time-{total_raw_doubling_title} days, Total-{int(total_raw_count_title)}',color=total_raw_color)
@@ -449,11 +425,13 @@ def plot_chart(plot_type=None):
 
     #Add logarithmic y-scale
     if 'log_y' in settings.keys() and settings['log_y'] == True:
+        if max_value <= 0: plt.ylim(1,10) #Nothing plotted, so nothing to scale from
         plt.yscale('log')
 
         y_locs, y_labels = plt.yticks()
         for i,loc in enumerate(y_locs):
-            if loc == 1.e+00: y_labels[i] = "1"
+            if loc == 1.e-01: y_labels[i] = "0.1"
+            elif loc == 1.e+00: y_labels[i] = "1"
             elif loc == 1.e+01: y_labels[i] = "10"
             elif loc == 1.e+02: y_labels[i] = "100"
             elif loc == 1.e+03: y_labels[i] = "1K"
@@ -467,7 +445,7 @@ def plot_chart(plot_type=None):
 
         plt.yticks(y_locs,y_labels)
 
-        plt.ylim(bottom=1)
+        plt.ylim(bottom=0.1 if plot_type.endswith('_normalized') else 1)
 
         if max_value<10: plt.ylim(top=10)
         elif max_value<100: plt.ylim(top=100)
@@ -510,6 +488,8 @@ def plot_chart(plot_type=None):
         'active':'Doubling Time of Daily COVID-19 Active Cases',
         'daily':'Doubling Time of Daily COVID-19 New Cases',
     }
+    for metric in read_data.normalized_metrics:
+        title_string[f"{metric}_normalized"] = f"{title_string[metric]} per 100,000 People"
     add_title = "\n(Non-Mainland China)" if mainland_china == False else ""
     plt.title(f"{title_string.get(plot_type)} {add_title}",fontweight='bold',loc='left')
     if left==0:
@@ -517,7 +497,8 @@ def plot_chart(plot_type=None):
     else:
         xlabel_text = "<--faster decrease\t\t\tfaster increase-->".expandtabs()
     plt.xlabel(xlabel_text,fontweight='bold')
-    plt.ylabel("Number of Cases",fontweight='bold')
+    if plot_type.endswith('_normalized'): plt.ylabel("Cases per 100,000 People",fontweight='bold')
+    else: plt.ylabel("Number of Cases",fontweight='bold')
 
 
 
@@ -545,7 +526,11 @@ def plot_chart(plot_type=None):
 
     #Show plot and close
     if save_image['setting'] == True:
-        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_doubling_world.png")
+        #Other windows, overlays and methods each get their own file
+        suffix = '' if lag_days == 7 else f'_{lag_days}day'
+        if len(overlay_windows) > 0: suffix += '_overlay' + '-'.join(str(window) for window in overlay_windows)
+        if method != 'endpoints': suffix += f'_{method}'
+        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_doubling_world{suffix}.png")
         plt.savefig(savepath,bbox_inches='tight')
     else:
         plt.show()
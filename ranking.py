@@ -0,0 +1,71 @@
+#Import packages
+import numpy as np
+
+def top_k(values, k, mask=None, largest=True):
+    """Indices of the k largest (or smallest) values, best first.
+
+    Only entries where mask is True (default: all) and the value isn't NaN are candidates; if fewer
+    than k qualify, all of them are returned. The k are picked with a single partial sort
+    (np.argpartition), so this stays O(n) however many regions there are; only the k picked are sorted.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    candidates = ~np.isnan(values)
+    if mask is not None: candidates &= np.asarray(mask, dtype=bool)
+    candidates = np.flatnonzero(candidates)
+
+    #Rank by key, smallest first
+    key = -values[candidates] if largest else values[candidates]
+    if k <= 0: return candidates[:0]
+    if k < len(candidates):
+        picked = np.argpartition(key, k-1)[:k]
+        candidates,key = candidates[picked],key[picked]
+    return candidates[np.argsort(key, kind='stable')]
+
+def bottom_k(values, k, mask=None):
+    """Indices of the k smallest values, smallest first (see top_k)."""
+    return top_k(values, k, mask, largest=False)
+
+def top_regions(cases, metric, k=10, mask=None, largest=True, date=-1):
+    """Names of the k regions of a case store with the largest (or smallest) value of a metric on a date."""
+    values = cases.series(metric)[:,date]
+    return [cases.regions[i] for i in top_k(values, k, mask, largest)]
+
+
+class RegionSummary:
+    """Per-region summary statistics of one metric, with the regions ordered by them.
+
+    max and last hold every region's peak and latest value (NaN for regions with no data at all,
+    which are left out of the orderings and percentiles). Orderings go from the largest value down,
+    ties broken by region name in reverse, matching sorted([(value, region), ...])[::-1].
+    """
+
+    def __init__(self, series, regions):
+        series = np.asarray(series, dtype=np.float64)
+        self.regions = list(regions)
+        self.region_index = {region:i for i,region in enumerate(self.regions)}
+        self.known = ~np.isnan(series).all(axis=1)
+        self.max = np.full(len(self.regions), np.nan)
+        self.max[self.known] = np.nanmax(series[self.known], axis=1)
+        self.last = series[:,-1].copy() if series.shape[1] > 0 else np.full(len(self.regions), np.nan)
+        self.stats = {'max':self.max, 'last':self.last}
+        self._orders = {}
+        self._percentiles = {}
+
+    def order(self, by='max'):
+        """Indices of the regions with data, from the largest value of a statistic down."""
+        if by not in self._orders:
+            candidates = np.flatnonzero(self.known)
+            names = np.array([self.regions[i] for i in candidates], dtype=str)
+            self._orders[by] = candidates[np.lexsort((names, self.stats[by][candidates]))[::-1]]
+        return self._orders[by]
+
+    def ordered(self, by='max'):
+        """(region, value) pairs of the regions with data, from the largest value of a statistic down."""
+        values = self.stats[by]
+        return [(self.regions[i], values[i]) for i in self.order(by)]
+
+    def percentile(self, q, by='max'):
+        """The q-th percentile of a statistic over the regions with data."""
+        if (q,by) not in self._percentiles:
+            self._percentiles[q,by] = np.percentile(self.stats[by][self.known], q)
+        return self._percentiles[q,by]
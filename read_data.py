@@ -1,429 +1,867 @@
 #Import packages & other scripts
 import os, sys
-import requests
+import json
+import pickle
+import hashlib
 import numpy as np
 import pandas as pd
 import datetime as dt
 
-def read_us(negative_daily=True):
+import csse_mirror
+import corrections
+from case_store import CaseStore, SparseCaseStore
+from regions import RegionRegistry
+from hierarchy import RegionHierarchy
+from doubling import DoublingTimes
+from reproduction import ReproductionNumbers
+from ranking import RegionSummary
+import smoothing
+
+def read_us(negative_daily=True, as_of=None, source=None):
+    return read_all(negative_daily, as_of, source=source)['us']
+
+def read_world(negative_daily=True, as_of=None, source=None):
+    return read_all(negative_daily, as_of, source=source)['world']
+
+def read_all(negative_daily=True, as_of=None, paths=None, source=None):
+    """Read every daily report once and build both the US state and the world country datasets from it.
+
+    as_of limits the data to reports through that date (default: through today). paths is the
+    report manifest, if the caller already has it. source picks the CSSE files to read, 'daily' or
+    'timeseries' (default: csse_mirror.source); see read_timeseries() for the latter.
+    Returns {'us':{'dates':..., 'cases':...}, 'world':{'dates':..., 'cases':...}}.
+    """
+    if source is None: source = csse_mirror.source
+    if source == 'timeseries': return read_timeseries(negative_daily, as_of, paths)
 
     #Construct list of dates with data available, through today
-    start_date = dt.datetime(2020,1,22)
-    iter_date = dt.datetime(2020,1,22)
-    end_date = dt.datetime.today()
-    dates = []
-    dates_sites = []
-    while iter_date <= end_date:
-        strdate = iter_date.strftime("%m-%d-%Y")
-        url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-        request = requests.get(url)
-        if request.status_code == 200:
-            dates.append(iter_date)
-            if iter_date >= dt.datetime(2020,3,1): dates_sites.append(iter_date)
-        iter_date += dt.timedelta(hours=24)
-
-    #US states list
-    state_abbr = {
-        'AL':'Alabama',
-        'AK':'Alaska',
-        'AZ':'Arizona',
-        'AR':'Arkansas',
-        'CA':'California',
-        'CO':'Colorado',
-        'CT':'Connecticut',
-        'DE':'Delaware',
-        'D.C.':'District of Columbia',
-        'FL':'Florida',
-        'GA':'Georgia',
-        'HI':'Hawaii',
-        'ID':'Idaho',
-        'IL':'Illinois',
-        'IN':'Indiana',
-        'IA':'Iowa',
-        'KS':'Kansas',
-        'KY':'Kentucky',
-        'LA':'Louisiana',
-        'ME':'Maine',
-        'MD':'Maryland',
-        'MA':'Massachusetts',
-        'MI':'Michigan',
-        'MN':'Minnesota',
-        'MS':'Mississippi',
-        'MO':'Missouri',
-        'MT':'Montana',
-        'NE':'Nebraska',
-        'NV':'Nevada',
-        'NH':'New Hampshire',
-        'NJ':'New Jersey',
-        'NM':'New Mexico',
-        'NY':'New York',
-        'NC':'North Carolina',
-        'ND':'North Dakota',
-        'OH':'Ohio',
-        'OK':'Oklahoma',
-        'OR':'Oregon',
-        'PA':'Pennsylvania',
-        'RI':'Rhode Island',
-        'SC':'South Carolina',
-        'SD':'South Dakota',
-        'TN':'Tennessee',
-        'TX':'Texas',
-        'UT':'Utah',
-        'VT':'Vermont',
-        'VA':'Virginia',
-        'WA':'Washington',
-        'WV':'West Virginia',
-        'WI':'Wisconsin',
-        'WY':'Wyoming',
-        'VI':'Virgin Islands',
-        'PR':'Puerto Rico',
-    }
+    #One manifest lookup finds every report; each file is then read exactly once from the mirror
+    if paths is None: paths = csse_mirror.report_manifest(as_of)
+    dates = list(paths.keys())
 
-    #US states list
-    state_populations = {
-        'Alabama':'4,903,185',
-        'Alaska':'731,545',
-        'Arizona':'7,278,717',
-        'Arkansas':'3,017,825',
-        'California':'39,512,223',
-        'Colorado':'5,758,736',
-        'Connecticut':'3,565,287',
-        'Delaware':'973,764',
-        'District Of Columbia':'705,749',
-        'Florida':'21,477,737',
-        'Georgia':'10,617,423',
-        'Hawaii':'1,415,872',
-        'Idaho':'1,787,147',
-        'Illinois':'12,671,821',
-        'Indiana':'6,732,219',
-        'Iowa':'3,155,070',
-        'Kansas':'2,913,314',
-        'Kentucky':'4,467,673',
-        'Louisiana':'4,648,794',
-        'Maine':'1,344,212',
-        'Maryland':'6,045,680',
-        'Massachusetts':'6,949,503',
-        'Michigan':'9,986,857',
-        'Minnesota':'5,639,632',
-        'Mississippi':'2,976,149',
-        'Missouri':'6,137,428',
-        'Montana':'1,068,778',
-        'Nebraska':'1,934,408',
-        'Nevada':'3,080,156',
-        'New Hampshire':'1,359,711',
-        'New Jersey':'8,882,190',
-        'New Mexico':'2,096,829',
-        'New York':'19,453,561',
-        'North Carolina':'10,488,084',
-        'North Dakota':'762,062',
-        'Ohio':'11,689,100',
-        'Oklahoma':'3,956,971',
-        'Oregon':'4,217,737',
-        'Pennsylvania':'12,801,989',
-        'Rhode Island':'1,059,361',
-        'South Carolina':'5,148,714',
-        'South Dakota':'884,659',
-        'Tennessee':'6,833,174',
-        'Texas':'28,995,881',
-        'Utah':'3,205,958',
-        'Vermont':'623,989',
-        'Virginia':'8,535,519',
-        'Washington':'7,614,893',
-        'West Virginia':'1,792,065',
-        'Wisconsin':'5,822,434',
-        'Wyoming':'578,759',
-        'Virgin Islands':'104,914',
-        'Puerto Rico':'3,193,694',
-        'Diamond Princess':'3000',
-        'Grand Princess':'3000',
-    }
+    #Pick up where the last run left off for each dataset
+    stores = {}; n_ingested = {}
+    for name,dataset in datasets.items():
+        stores[name], n_ingested[name] = load_ingest_state(name, negative_daily, dates, dataset['new'](dates))
+
+    #Only parse days added since then, and feed each parsed day to every dataset that needs it
+    first_new = min(n_ingested.values())
+    new_paths = {date:paths[date] for date in dates[first_new:]}
+    for idx,(start_date,df) in enumerate(report_stream(new_paths), first_new):
+        for name,dataset in datasets.items():
+            if idx < n_ingested[name]: continue
+            totals = run_stages(start_date, df, dataset['stages'], stores[name])
+            dataset['sink'](stores[name], idx, start_date, totals, negative_daily)
+
+    #Derived metrics are computed for the whole dataset at once
+    for name in datasets.keys():
+        if n_ingested[name] == len(dates): continue
+        derive_dataset(name, stores[name], negative_daily)
+
+    output = {}
+    for name in datasets.keys():
+        #Only full-history runs are stored, so a past as_of never truncates the stored state
+        if as_of is None: save_ingest_state(name, negative_daily, dates, stores[name])
+        output[name] = {'dates':dates,
+                        'cases':stores[name]}
+    return output
+
+
+#========================================================================================================
+# In-process dataset cache
+#========================================================================================================
+
+#Datasets already read by this process, keyed by (name, negative_daily, as-of day, source)
+_dataset_cache = {}
+
+def _cache_key(name, negative_daily, as_of, source):
+    if as_of is None: as_of = dt.datetime.today()
+    return (name, bool(negative_daily), as_of.strftime("%Y-%m-%d"), source)
 
+def load_dataset(name, negative_daily=True, as_of=None, source=None):
+    """Return the 'us' or 'world' dataset, reading case data only if this process hasn't already.
+
+    Every plot script gets its data through here, so a full plot_all.py run ingests once.
+    Both datasets come out of the same pass, so loading one also caches the other.
+    source is 'daily' or 'timeseries' (default: csse_mirror.source).
+    """
+    if source is None: source = csse_mirror.source
+    key = _cache_key(name, negative_daily, as_of, source)
+    if key in _dataset_cache: return _dataset_cache[key]
+
+    #Start from the binary snapshot if it matches the mirrored files
+    paths = csse_mirror.report_manifest(as_of) if source == 'daily' else csse_mirror.fetch_timeseries()
+    signature = source_signature(paths, negative_daily, source)
+    if as_of is None:
+        snapshots = {other:load_snapshot(other, negative_daily, signature, source) for other in datasets.keys()}
+        if all(output is not None for output in snapshots.values()):
+            for other,output in snapshots.items():
+                _dataset_cache[_cache_key(other, negative_daily, as_of, source)] = output
+            return _dataset_cache[key]
+
+    print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
+    for other,output in read_all(negative_daily, as_of, paths, source).items():
+        _dataset_cache[_cache_key(other, negative_daily, as_of, source)] = output
+        if as_of is None: save_snapshot(other, negative_daily, output, signature, source)
+    return _dataset_cache[key]
+
+def clear_cache(name=None):
+    """Forget cached datasets (all of them, or only those for one dataset name)."""
+    for key in list(_dataset_cache.keys()):
+        if name is None or key[0] == name: del _dataset_cache[key]
+
+
+#========================================================================================================
+# US states
+#========================================================================================================
+
+#US states list
+state_abbr = {
+    'AL':'Alabama',
+    'AK':'Alaska',
+    'AZ':'Arizona',
+    'AR':'Arkansas',
+    'CA':'California',
+    'CO':'Colorado',
+    'CT':'Connecticut',
+    'DE':'Delaware',
+    'D.C.':'District of Columbia',
+    'FL':'Florida',
+    'GA':'Georgia',
+    'HI':'Hawaii',
+    'ID':'Idaho',
+    'IL':'Illinois',
+    'IN':'Indiana',
+    'IA':'Iowa',
+    'KS':'Kansas',
+    'KY':'Kentucky',
+    'LA':'Louisiana',
+    'ME':'Maine',
+    'MD':'Maryland',
+    'MA':'Massachusetts',
+    'MI':'Michigan',
+    'MN':'Minnesota',
+    'MS':'Mississippi',
+    'MO':'Missouri',
+    'MT':'Montana',
+    'NE':'Nebraska',
+    'NV':'Nevada',
+    'NH':'New Hampshire',
+    'NJ':'New Jersey',
+    'NM':'New Mexico',
+    'NY':'New York',
+    'NC':'North Carolina',
+    'ND':'North Dakota',
+    'OH':'Ohio',
+    'OK':'Oklahoma',
+    'OR':'Oregon',
+    'PA':'Pennsylvania',
+    'RI':'Rhode Island',
+    'SC':'South Carolina',
+    'SD':'South Dakota',
+    'TN':'Tennessee',
+    'TX':'Texas',
+    'UT':'Utah',
+    'VT':'Vermont',
+    'VA':'Virginia',
+    'WA':'Washington',
+    'WV':'West Virginia',
+    'WI':'Wisconsin',
+    'WY':'Wyoming',
+    'VI':'Virgin Islands',
+    'PR':'Puerto Rico',
+}
+
+#US state populations
+state_populations = {
+    'Alabama':4_903_185,
+    'Alaska':731_545,
+    'Arizona':7_278_717,
+    'Arkansas':3_017_825,
+    'California':39_512_223,
+    'Colorado':5_758_736,
+    'Connecticut':3_565_287,
+    'Delaware':973_764,
+    'District Of Columbia':705_749,
+    'Florida':21_477_737,
+    'Georgia':10_617_423,
+    'Hawaii':1_415_872,
+    'Idaho':1_787_147,
+    'Illinois':12_671_821,
+    'Indiana':6_732_219,
+    'Iowa':3_155_070,
+    'Kansas':2_913_314,
+    'Kentucky':4_467_673,
+    'Louisiana':4_648_794,
+    'Maine':1_344_212,
+    'Maryland':6_045_680,
+    'Massachusetts':6_949_503,
+    'Michigan':9_986_857,
+    'Minnesota':5_639_632,
+    'Mississippi':2_976_149,
+    'Missouri':6_137_428,
+    'Montana':1_068_778,
+    'Nebraska':1_934_408,
+    'Nevada':3_080_156,
+    'New Hampshire':1_359_711,
+    'New Jersey':8_882_190,
+    'New Mexico':2_096_829,
+    'New York':19_453_561,
+    'North Carolina':10_488_084,
+    'North Dakota':762_062,
+    'Ohio':11_689_100,
+    'Oklahoma':3_956_971,
+    'Oregon':4_217_737,
+    'Pennsylvania':12_801_989,
+    'Rhode Island':1_059_361,
+    'South Carolina':5_148_714,
+    'South Dakota':884_659,
+    'Tennessee':6_833_174,
+    'Texas':28_995_881,
+    'Utah':3_205_958,
+    'Vermont':623_989,
+    'Virginia':8_535_519,
+    'Washington':7_614_893,
+    'West Virginia':1_792_065,
+    'Wisconsin':5_822_434,
+    'Wyoming':578_759,
+    'Virgin Islands':104_914,
+    'Puerto Rico':3_193_694,
+    'Diamond Princess':3000,
+    'Grand Princess':3000,
+}
+
+#Population of every US region, keyed like the case store
+state_population_counts = {key.lower():value for key,value in state_populations.items()}
+
+#Canonical US regions, with every spelling CSSE has used for them
+us_registry = RegionRegistry()
+us_registry.add('diamond princess')
+us_registry.add('grand princess')
+for abbr,state in state_abbr.items(): us_registry.add(state, [abbr])
+us_registry.add('virgin islands', ['Virgin Islands, U.S.'])
+#Handle Diamond Princess & Grand Princess cases separately
+us_registry.add_contains_rule('Diamond Princess', 'diamond princess')
+us_registry.add_contains_rule('Grand Princess', 'grand princess')
+#Handle "County, ST" locations by their state abbreviation
+us_registry.suffix_rule = True
+#Special handling for 2/21/2020
+for location in ["Lackland, TX","Travis, CA","Ashland, NE"]:
+    us_registry.add_date_rule(dt.datetime(2020,2,21), location, 'diamond princess')
+
+def new_us_cases(dates):
     #Create entry for each US state, along with Diamond Princess
-    cases = {}
     inverse_state_abbr = {v: k for k, v in state_abbr.items()}
-    for key in ['diamond princess','grand princess'] + [key.lower() for key in inverse_state_abbr.keys()]:
-        cases[key] = {'date':dates,
-                        'confirmed':[0 for i in range(len(dates))],
-                        'confirmed_normalized':[0 for i in range(len(dates))],
-                        'deaths':[0 for i in range(len(dates))],
-                        'recovered':[0 for i in range(len(dates))],
-                        'active':[0 for i in range(len(dates))],
-                        'daily':[0 for i in range(len(dates))]}
-
-    #Add individual location sites for plotting dots
-    cases_sites = {}
-
-    #Construct list of dates
-    start_date = dates[0]
-    end_date = dates[-1]
-    while start_date <= end_date:
-
-        #Read in CSV file
-        strdate = start_date.strftime("%m-%d-%Y")
-        url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-        df = pd.read_csv(url)
-        df = df.fillna(0) #replace NaNs with zero
-
-        #Isolate cases to only those in US
+    regions = ['diamond princess','grand princess'] + [key.lower() for key in inverse_state_abbr.keys()]
+    return CaseStore(dates, regions, floats=['daily'] + normalized_names)
+
+def us_rows(date, df, cases):
+    #Isolate cases to only those in US
+    df_us = df.loc[df['Country_Region'] == "US", ['Province_State','Confirmed','Deaths','Recovered']]
+    return df_us.fillna({'Confirmed':0,'Deaths':0,'Recovered':0})
+
+def us_canonicalize(date, df, cases):
+    #Map every location to its case store region id
+    df = df.copy()
+    df['region'] = us_registry.store_ids(cases, us_registry.resolve(df['Province_State'], date))
+    return df
+
+def us_timeseries_ids(df, cases):
+    #Case store region ids for the rows of a US time series file
+    return us_registry.store_ids(cases, us_registry.resolve(df['Province_State']))
+
+#========================================================================================================
+# World countries
+#========================================================================================================
+
+def new_world_cases(dates):
+    #Countries are added to the case store as they appear
+    return CaseStore(dates, floats=['daily'] + normalized_names)
+
+def world_rows(date, df, cases):
+    return df[['Country_Region','Confirmed','Deaths','Recovered']].fillna({'Confirmed':0,'Deaths':0,'Recovered':0})
+
+def world_canonicalize(date, df, cases):
+    #Map every country to its case store region id, adding any region not seen before
+    df = df.copy()
+    df['region'] = world_registry.store_ids(cases, world_registry.resolve(df['Country_Region'], date), add=True)
+    return df
+
+def world_timeseries_ids(df, cases):
+    #Case store region ids for the rows of a global time series file, adding any region not seen before
+    return world_registry.store_ids(cases, world_registry.resolve(df['Country_Region']), add=True)
+
+#========================================================================================================
+# Reading daily reports
+#========================================================================================================
+
+#Schema of the CSSE daily reports. Each canonical column lists every header spelling it has had
+#over time, and the compact dtype it is read with.
+report_schema = {
+    'Province_State':{'aliases':['Province/State','Province_State'], 'dtype':'category'},
+    'Country_Region':{'aliases':['Country/Region','Country_Region'], 'dtype':'category'},
+    'Admin2':{'aliases':['Admin2'], 'dtype':'category'},
+    'FIPS':{'aliases':['FIPS'], 'dtype':'category'},
+    'Last_Update':{'aliases':['Last Update','Last_Update'], 'dtype':'category'},
+    'Lat':{'aliases':['Latitude','Lat'], 'dtype':'float32'},
+    'Long_':{'aliases':['Longitude','Long_'], 'dtype':'float32'},
+    'Confirmed':{'aliases':['Confirmed'], 'dtype':'Int32'},
+    'Deaths':{'aliases':['Deaths'], 'dtype':'Int32'},
+    'Recovered':{'aliases':['Recovered'], 'dtype':'Int32'},
+    'Active':{'aliases':['Active'], 'dtype':'Int32'},
+}
+
+#Columns the state & country datasets need; everything else is never parsed
+ingest_columns = ['Province_State','Country_Region','Confirmed','Deaths','Recovered']
+
+def read_report(path, columns=None):
+    """Read one daily report with only the wanted canonical columns, in compact dtypes.
+
+    Whatever header spellings the file uses are renamed to the canonical ones in report_schema.
+    Columns missing from an older file are added empty, and text columns have no NaNs.
+    """
+    if columns is None: columns = ingest_columns
+    aliases = {alias:column for column in columns for alias in report_schema[column]['aliases']}
+    dtypes = {alias:report_schema[column]['dtype'] for alias,column in aliases.items()}
+    df = pd.read_csv(path, encoding='utf-8-sig', usecols=lambda header: header in aliases, dtype=dtypes)
+    df = df.rename(columns=aliases)
+
+    for column in columns:
+        if column not in df.columns:
+            df[column] = pd.Series(pd.NA if report_schema[column]['dtype'] == 'Int32' else '',
+                                   index=df.index, dtype=report_schema[column]['dtype'])
+        elif report_schema[column]['dtype'] == 'category' and df[column].isna().any():
+            if '' not in df[column].cat.categories: df[column] = df[column].cat.add_categories('')
+            df[column] = df[column].fillna('')
+    return df[columns]
+
+#Fix for country name changes
+country_renames = {
+    'Iran (Islamic Republic of)':'Iran',
+    'Republic of Korea':'South Korea',
+    'Korea, South':'South Korea',
+    'Cruise Ship':'Others',
+    'China':'Mainland China',
+    'United Kingdom':'UK',
+    'occupied Palestinian territory':'Palestine',
+    'Taiwan*':'Taiwan',
+    'Taipei and environs':'Taiwan',
+    'Czechia':'Czech Republic',
+}
+
+#Population of every world region, keyed like the case store
+world_populations_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'world_populations.csv')
+
+def read_populations(path=None):
+    """Read a population table (region,population) into {region: population}, skipping blank ones."""
+    if path is None: path = world_populations_path
+    table = pd.read_csv(path, comment='#', dtype={'region':str, 'population':float}).dropna()
+    return dict(zip(table['region'], table['population'].astype(np.int64)))
+
+world_population_counts = read_populations()
+
+#Canonical world regions; countries not listed here are added under their own name as they appear
+world_registry = RegionRegistry(auto_add=True)
+for old_name,new_name in country_renames.items(): world_registry.add(new_name, [old_name])
+
+#========================================================================================================
+# Streaming ingestion pipeline
+#========================================================================================================
+
+"""
+Ingestion is a stream of (date, frame) pairs, one daily report at a time:
+
+    source  csse_mirror.stream_reports() yields each report, parsed by read_report(), in date order
+    stages  functions stage(date, df, cases) -> df, applied in turn: row selection, canonical region
+            ids, aggregation into one row per region, corrections
+    sink    sink(cases, idx, date, totals, negative_daily) writes the aggregated day into the case store
+
+Once every new day is in, derived metrics (active, daily, per-capita) are computed over the whole
+case store, and corrections to them (see corrections.py) are applied.
+
+Only a bounded number of parsed days are held in memory at once, however long the history is.
+Other consumers can reuse the source and any of the stages without copying the loop.
+"""
+
+#Metrics that get a per-100,000 people version, and the names those are stored under
+normalized_metrics = ['confirmed','deaths','recovered','active','daily']
+normalized_names = [f"{metric}_normalized" for metric in normalized_metrics]
+
+def aggregate(date, df, cases):
+    """Sum a day's rows into one row per case store region (indexed by region id)."""
+    df = df[df['region'].to_numpy() >= 0]
+    values = df[['Confirmed','Deaths','Recovered']].astype(np.int64)
+    return values.groupby(df['region'].to_numpy()).sum()
+
+def add_totals(cases, idx, date, totals, negative_daily=True):
+    """Write one day's aggregated totals into the case store at date index idx."""
+    rows = totals.index.to_numpy()
+
+    #Add cases to entry for each region & day
+    cases.series('confirmed')[rows,idx] += totals['Confirmed'].to_numpy().astype(np.int32)
+    cases.series('deaths')[rows,idx] += totals['Deaths'].to_numpy().astype(np.int32)
+    cases.series('recovered')[rows,idx] += totals['Recovered'].to_numpy().astype(np.int32)
+    cases.series('reported')[rows,idx] = 1
+
+def derive_metrics(cases, negative_daily=True):
+    """Compute active cases and the daily change for every region & date in whole-array operations.
+
+    Run once after ingestion rather than per row. The daily change is only set where a region
+    was reported that day, and is NaN on the first date.
+    """
+    confirmed = cases.series('confirmed')
+    reported = cases.series('reported') > 0
+
+    #Active cases = confirmed total - recovered - deaths
+    cases.series('active')[:] = confirmed - cases.series('recovered') - cases.series('deaths')
+
+    #Daily change in confirmed cases
+    daily_change = np.zeros(confirmed.shape)
+    daily_change[:,0] = np.nan
+    daily_change[:,1:] = np.diff(confirmed.astype(np.int64), axis=1)
+    if negative_daily == False: daily_change = np.maximum(daily_change,0)
+    cases.series('daily')[:] = np.where(reported, daily_change, 0)
+
+def normalize_metrics(cases, populations):
+    """Add a per-100,000 people version of every metric in normalized_metrics, as '<metric>_normalized'.
+
+    populations maps case store region names to their population. All metrics are divided at once;
+    regions without a known population get NaN.
+    """
+    population = np.array([populations.get(key, np.nan) for key in cases.keys()], dtype=np.float64)
+    population[population <= 0] = np.nan
+    values = np.stack([cases.series(metric) for metric in normalized_metrics], axis=2)
+    normalized = values / population[:,None,None] * 100000
+    for i,name in enumerate(normalized_names): cases.add_metric(name, normalized[:,:,i])
+
+def derive_dataset(name, cases, negative_daily=True):
+    """Derive a freshly ingested dataset's metrics, correct them, then add their per-100,000 versions."""
+    derive_metrics(cases, negative_daily)
+
+    #Raw counts were already corrected day by day (see corrections.correction_stage), so active is right.
+    #correct_store fixes derived metrics such as daily, and must run before anything that reads them,
+    #or a corrected day leaks into e.g. daily_normalized.
+    corrections.correct_store(name, cases)
+    normalize_metrics(cases, datasets[name]['populations'])
+
+def run_stages(date, df, stages, cases=None):
+    """Run one day's frame through a list of stages."""
+    for stage in stages: df = stage(date, df, cases)
+    return df
+
+def apply_stages(stream, stages, cases=None):
+    """Lazily run every (date, frame) of a stream through a list of stages."""
+    for date,df in stream:
+        yield date, run_stages(date, df, stages, cases)
+
+def report_stream(paths, columns=None):
+    """Stream (date, report) pairs from a report manifest, parsing only the given columns."""
+    return csse_mirror.stream_reports(paths, lambda path: read_report(path, columns))
+
+#Every dataset built by read_all()
+datasets = {
+    'us':{'new':new_us_cases,
+          'stages':[us_rows, us_canonicalize, aggregate, corrections.correction_stage('us')],
+          'sink':add_totals,
+          'populations':state_population_counts,
+          'timeseries':('US', us_timeseries_ids)},
+    'world':{'new':new_world_cases,
+             'stages':[world_rows, world_canonicalize, aggregate, corrections.correction_stage('world')],
+             'sink':add_totals,
+             'populations':world_population_counts,
+             'timeseries':('global', world_timeseries_ids)},
+}
+
+
+#========================================================================================================
+# Time series ingestion
+#========================================================================================================
+
+def read_timeseries_file(path):
+    """Read one wide CSSE time series file.
+
+    Returns (df, columns): the file with canonical column names (see report_schema), and a
+    date-ordered {date: column} dict of its per-day columns.
+    """
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    aliases = {alias:column for column,schema in report_schema.items() for alias in schema['aliases']}
+    df = df.rename(columns=aliases)
+
+    columns = {}
+    for column in df.columns:
         try:
-            df_us = df.loc[df["Country/Region"] == "US"]
-        except:
-            df_us = df.loc[df["Country_Region"] == "US"]
-
-        #Construct dict of all states
-        dict_iter = []
-        dict_used = []
-        for _,row in df_us.iterrows():
-            entry = {}
-            try:
-                dict_used.append(row['Province/State'].lower())
-                entry['Province/State'] = row['Province/State']
-            except:
-                dict_used.append(row['Province_State'].lower())
-                entry['Province_State'] = row['Province_State']
-            entry['Confirmed'] = row['Confirmed']
-            entry['Deaths'] = row['Deaths']
-            entry['Recovered'] = row['Recovered']
-            dict_iter.append(entry)
-
-        #Account for state discontinuities
-        if start_date == dt.datetime(2020,3,14):
-            #Source: https://covidtracking.com/notes/
-            entry = {}
-            dict_used.append('alaska')
-            try:
-                entry['Province/State'] = 'alaska'
-            except:
-                entry['Province_State'] = 'alaska'
-            entry['Confirmed'] = 1
-            entry['Deaths'] = 0
-            entry['Recovered'] = 0
-            dict_iter.append(entry)
-
-        """
-        for key in [k for k in cases.keys() if k not in ['diamond princess','grand princess']]:
-            if key not in dict_used:
-                entry = {}
-                idx = dates.index(start_date)
-                entry['Province/State'] = key
-                entry['Confirmed'] = 0
-                entry['Deaths'] = 0
-                entry['Recovered'] = 0
-                dict_iter.append(entry)
-        """
-
-        #Iterate through every US case
-        for row in dict_iter:
-
-            #Get state/province name
-            try:
-                location = row['Province/State']
-            except:
-                location = row['Province_State']
-
-            #Get index of date within list
-            idx = dates.index(start_date)
-
-            #Special handling for 2/21/2020
-            if start_date.strftime("%Y%m%d") == "20200221":
-                if "Lackland, TX" in location or "Travis, CA" in location or "Ashland, NE" in location:
-                    location = location + "(Diamond Princess)"
-
-            #Handle Diamond Princess cases separately
-            if "Diamond Princess" in location:
-                cases["diamond princess"]['confirmed'][idx] += int(row['Confirmed'])
-                cases["diamond princess"]['deaths'][idx] += int(row['Deaths'])
-                cases["diamond princess"]['recovered'][idx] += int(row['Recovered'])
-                cases["diamond princess"]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                if idx == 0:
-                    cases["diamond princess"]['daily'][idx] = np.nan
-                else:
-                    daily_change = cases["diamond princess"]['confirmed'][idx] - cases["diamond princess"]['confirmed'][idx-1]
-                    if negative_daily == False and daily_change < 0: daily_change = 0
-                    cases["diamond princess"]['daily'][idx] = daily_change
-
-            #Handle Grand Princess cases separately
-            elif "Grand Princess" in location:
-                cases["grand princess"]['confirmed'][idx] += int(row['Confirmed'])
-                cases["grand princess"]['deaths'][idx] += int(row['Deaths'])
-                cases["grand princess"]['recovered'][idx] += int(row['Recovered'])
-                cases["grand princess"]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                if idx == 0:
-                    cases["grand princess"]['daily'][idx] = np.nan
-                else:
-                    daily_change = cases["grand princess"]['confirmed'][idx] - cases["grand princess"]['confirmed'][idx-1]
-                    if negative_daily == False and daily_change < 0: daily_change = 0
-                    cases["grand princess"]['daily'][idx] = daily_change
-
-            #Otherwise, handle states
-            else:
-                #Handle state abbreviation vs. full state name
-                if ',' in location:
-                    abbr = (location.split(",")[1]).replace(" ","")
-                    state = state_abbr.get(abbr)
-                else:
-                    state = str(location)
-
-                #Virgin Islands handling
-                if location == "Virgin Islands, U.S.":
-                    state = "virgin islands"
-
-                #Manually edit data points that are inaccurate due to CSSE server maintenance
-                if start_date == dt.datetime(2020,3,13):
-                    #Source: New York Times
-                    correct_number = {
-                        'new jersey':51,
-                        'arkansas':9,
-                        'colorado':77,
-                    }
-                    if state.lower() in correct_number.keys(): row['Confirmed'] = correct_number.get(state.lower())
-
-                #Add cases to entry for this state & day
-                if state.lower() in cases.keys():
-                    cases[state.lower()]['confirmed'][idx] += int(row['Confirmed'])
-                    cases[state.lower()]['deaths'][idx] += int(row['Deaths'])
-                    cases[state.lower()]['recovered'][idx] += int(row['Recovered'])
-                    cases[state.lower()]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                    if idx == 0:
-                        cases[state.lower()]['daily'][idx] = np.nan
-                    else:
-                        daily_change = cases[state.lower()]['confirmed'][idx] - cases[state.lower()]['confirmed'][idx-1]
-                        if negative_daily == False and daily_change < 0: daily_change = 0
-                        cases[state.lower()]['daily'][idx] = daily_change
-
-        #Normalize count by population
-        for key in cases.keys():
-
-            #Get state's population data
-            state_pop = int((state_populations.get(key.title())).replace(",",""))
-
-            #Get index of date within list
-            idx = dates.index(start_date)
-
-            #Add case count per 100,000 people
-            case_count = cases[key]['confirmed'][idx]
-            cases[key]['confirmed_normalized'][idx] = (float(case_count) / float(state_pop)) * 100000
-
-        #Increment date by 1 day
-        start_date += dt.timedelta(hours=24)
+            columns[dt.datetime.strptime(column, "%m/%d/%y")] = column
+        except ValueError:
+            continue
+    for column in ('Province_State','Country_Region'):
+        if column in df.columns: df[column] = df[column].fillna('')
+    return df, dict(sorted(columns.items()))
 
-    return {'dates':dates,
-            'cases':cases,}
+def read_timeseries(negative_daily=True, as_of=None, paths=None):
+    """Build both datasets from the CSSE time series files, with the same output as read_all().
 
+    Each file holds every day for one metric, so the whole history comes from a handful of reads.
+    paths is {(metric, scope): path} as returned by csse_mirror.fetch_timeseries(). There is no US
+    recovered file, so US recovered counts are 0. Raw-count corrections patch daily-report problems
+    that CSSE fixed in the time series, so only corrections to derived metrics are applied.
+    """
+    if paths is None: paths = csse_mirror.fetch_timeseries()
+    frames = {key:read_timeseries_file(path) for key,path in paths.items()}
+    if len(frames) == 0: raise FileNotFoundError("No CSSE time series files found")
 
+    #Every date in the files, through as_of
+    dates = sorted(set(date for df,columns in frames.values() for date in columns.keys()))
+    if as_of is not None: dates = [date for date in dates if date <= as_of]
 
-def read_world(negative_daily=True):
+    output = {}
+    for name,dataset in datasets.items():
+        cases = dataset['new'](dates)
+        scope,timeseries_ids = dataset['timeseries']
 
-    #Construct list of dates with data available, through today
-    start_date = dt.datetime(2020,1,22)
-    iter_date = dt.datetime(2020,1,22)
-    end_date = dt.datetime.today()
-    dates = []
-    while iter_date <= end_date:
-        strdate = iter_date.strftime("%m-%d-%Y")
-        url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-        request = requests.get(url)
-        if request.status_code == 200: dates.append(iter_date)
-        iter_date += dt.timedelta(hours=24)
+        #Resolve every file's regions first, so the store has all its regions before it is filled
+        metrics = [metric for metric in ('confirmed','deaths','recovered') if (metric,scope) in frames]
+        ids = {metric:timeseries_ids(frames[(metric,scope)][0], cases) for metric in metrics}
 
-    #Create entry for each US state, along with Diamond Princess
-    cases = {}
-
-    #Construct list of dates
-    start_date = dates[0]
-    end_date = dates[-1]
-    while start_date <= end_date:
-
-        #Read in CSV file
-        strdate = start_date.strftime("%m-%d-%Y")
-        url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-        df = pd.read_csv(url)
-        df = df.fillna(0) #replace NaNs with zero
-
-        #sum by country
-        cols = (df.columns).tolist()
-        if 'Last Update' in cols: df = df.drop(columns=['Last Update'])
-        if 'Latitude' in cols: df = df.drop(columns=['Latitude'])
-        if 'Longitude' in cols: df = df.drop(columns=['Longitude'])
+        #Sum each file's rows into their regions, for all dates at once
+        for metric in metrics:
+            df,columns = frames[(metric,scope)]
+            values = df.reindex(columns=[columns.get(date) for date in dates]).fillna(0).to_numpy(dtype=np.int64)
+            keep = ids[metric] >= 0
+            totals = np.zeros((len(cases), len(dates)), dtype=np.int64)
+            np.add.at(totals, ids[metric][keep], values[keep])
+            cases.series(metric)[:] = totals
+
+        #Every region has a value for every day, so count regions as reported from their first case
+        any_cases = (cases.series('confirmed') > 0) | (cases.series('deaths') > 0) | (cases.series('recovered') > 0)
+        cases.series('reported')[:] = np.maximum.accumulate(any_cases, axis=1)
+        derive_dataset(name, cases, negative_daily)
+        output[name] = {'dates':dates,
+                        'cases':cases}
+    return output
+
+def cross_check(negative_daily=True, as_of=None, metrics=('confirmed','deaths','recovered')):
+    """Compare the datasets built from the daily reports with those built from the time series.
+
+    Returns a DataFrame with a row per (dataset, region, metric) that differs on any date both sources
+    have: the number of days that differ, the largest difference and the first date it differs.
+    Regions only one source has get a single row with metric 'region' and a note saying which.
+    """
+    rows = []
+    for name in datasets.keys():
+        daily = load_dataset(name, negative_daily, as_of, 'daily')
+        timeseries = load_dataset(name, negative_daily, as_of, 'timeseries')
+        a,b = daily['cases'], timeseries['cases']
+
+        for region in set(a.keys()) ^ set(b.keys()):
+            source = 'daily' if region in a else 'timeseries'
+            rows.append({'dataset':name, 'region':region, 'metric':'region', 'note':f"only in {source}"})
+
+        #Line up the regions & dates both sources have
+        regions = [region for region in a.keys() if region in b]
+        dates = [date for date in daily['dates'] if date in b.date_positions]
+        ra = [a.region_index[region] for region in regions]; rb = [b.region_index[region] for region in regions]
+        da = [a.date_positions[date] for date in dates]; db = [b.date_positions[date] for date in dates]
+
+        for metric in metrics:
+            difference = (b.series(metric)[rb][:,db].astype(np.int64) - a.series(metric)[ra][:,da].astype(np.int64))
+            differs = difference != 0
+            for i in np.flatnonzero(differs.any(axis=1)):
+                rows.append({'dataset':name, 'region':regions[i], 'metric':metric,
+                             'days':int(differs[i].sum()),
+                             'max_difference':int(difference[i][np.argmax(np.abs(difference[i]))]),
+                             'first_date':dates[int(np.argmax(differs[i]))],
+                             'note':''})
+
+    columns = ['dataset','region','metric','days','max_difference','first_date','note']
+    return pd.DataFrame(rows, columns=columns)
+
+
+#========================================================================================================
+# US counties
+#========================================================================================================
+
+#First daily report with county (Admin2) rows; earlier reports are never parsed for counties
+county_first_date = dt.datetime(2020,3,22)
+
+#Columns the county dataset needs
+county_columns = ['Admin2','FIPS','Province_State','Country_Region','Confirmed','Deaths']
+
+#County keys: 5-digit FIPS codes, or "state|county" for rows without one (e.g. "Unassigned")
+county_registry = RegionRegistry(auto_add=True)
+
+def county_rows(date, df, cases=None):
+    #Isolate US rows that are for a county
+    df = df.loc[(df['Country_Region'] == "US") & ((df['Admin2'] != '') | (df['FIPS'] != ''))]
+    return df.fillna({'Confirmed':0,'Deaths':0})
+
+def county_fips(df):
+    """The zero-padded 5-digit FIPS code of every row ('' where it has none)."""
+    codes = pd.to_numeric(df['FIPS'], errors='coerce').to_numpy(dtype=np.float64)
+    valid = (codes >= 0) & (codes == np.floor(codes))
+    fips = np.full(len(codes), '', dtype=object)
+    fips[valid] = np.char.zfill(codes[valid].astype(np.int64).astype(str), 5)
+    return fips
+
+def county_keys(df, fips=None):
+    """The county key of every row: its FIPS code, or "state|county" if it has none."""
+    if fips is None: fips = county_fips(df)
+    names = df['Province_State'].astype(str) + '|' + df['Admin2'].astype(str)
+    return np.where(fips != '', fips, names)
+
+def read_counties(as_of=None, paths=None):
+    """Read every US county row of the daily reports into a SparseCaseStore of confirmed & deaths.
+
+    Regions are county keys (see county_keys()); the labels 'fips' (categorical), 'admin2' and
+    'state' hold each county's latest FIPS code and names. Returns {'dates':..., 'cases':...}.
+    """
+    if paths is None: paths = csse_mirror.report_manifest(as_of)
+    dates = list(paths.keys())
+    county_paths = {date:path for date,path in paths.items() if date >= county_first_date}
+
+    #Collect one row per county reading; the store is built from all of them at once.
+    #Labels are kept once per registry id, each day overwriting those of the counties it reports.
+    ids = []; date_ids = []; values = []
+    labels = {label:np.zeros(0, dtype=object) for label in ['fips','admin2','state']}
+    for idx,(date,df) in enumerate(report_stream(county_paths, county_columns), len(dates)-len(county_paths)):
+        df = county_rows(date, df)
+        if len(df) == 0: continue
+        fips = county_fips(df)
+        day_ids = county_registry.resolve(county_keys(df, fips))
+        ids.append(day_ids)
+        date_ids.append(np.full(len(df), idx, dtype=np.int64))
+        values.append(df[['Confirmed','Deaths']].to_numpy(dtype=np.int64))
+
+        #Latest row of every county reported that day
+        size = len(county_registry.names)
+        for label in labels:
+            if len(labels[label]) < size:
+                labels[label] = np.concatenate([labels[label], np.full(size-len(labels[label]), '', dtype=object)])
+        last = len(day_ids) - 1 - np.unique(day_ids[::-1], return_index=True)[1]
+        labels['fips'][day_ids[last]] = fips[last]
+        labels['admin2'][day_ids[last]] = df['Admin2'].astype(str).to_numpy()[last]
+        labels['state'][day_ids[last]] = df['Province_State'].astype(str).to_numpy()[last]
+
+    if len(ids) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        cases = SparseCaseStore.from_rows(dates, [], empty, empty, np.zeros((0,2), dtype=np.int64))
+        return {'dates':dates, 'cases':cases}
+    ids = np.concatenate(ids); date_ids = np.concatenate(date_ids)
+    values = np.concatenate(values)
+
+    #Number the counties that were seen
+    uniques,region_ids = np.unique(ids, return_inverse=True)
+    region_ids = region_ids.reshape(-1)
+    latest_labels = {'fips':pd.Categorical(labels['fips'][uniques].astype(str)),
+                     'admin2':labels['admin2'][uniques],
+                     'state':labels['state'][uniques]}
+
+    cases = SparseCaseStore.from_rows(dates, [county_registry.names[rid] for rid in uniques], region_ids,
+                                      date_ids, values, ('confirmed','deaths'), latest_labels)
+    return {'dates':dates, 'cases':cases}
+
+def rollup_states(counties, cache=None):
+    """State totals from a county store, as a CaseStore keyed like the US state dataset.
+
+    This is the county level of region_hierarchy; cache works as for RegionHierarchy.rollup_cases.
+    """
+    return region_hierarchy.rollup_cases('county', counties, cache=cache)
+
+def load_county_states(as_of=None):
+    """State totals of the county dataset (see rollup_states), summed once and kept with it."""
+    output = load_counties(as_of)
+    return rollup_states(output['cases'], output.setdefault('rollups', {}))
+
+def load_counties(as_of=None):
+    """Return the county dataset, reading it only if this process (or a matching snapshot) hasn't."""
+    key = _cache_key('counties', True, as_of, 'daily')
+    if key in _dataset_cache: return _dataset_cache[key]
+
+    paths = csse_mirror.report_manifest(as_of)
+    signature = source_signature(paths, True, 'counties')
+    output = load_county_snapshot(signature) if as_of is None else None
+    if output is None:
+        print("--> Reading in COVID-19 county data from Johns Hopkins CSSE")
+        output = read_counties(as_of, paths)
+        if as_of is None: save_county_snapshot(output, signature)
+    _dataset_cache[key] = output
+    return output
+
+
+#========================================================================================================
+# Region hierarchy
+#========================================================================================================
+
+#Regions flown home from cruise ships, rather than infected in the US
+repatriated_locations = ['diamond princess','grand princess']
+
+#Counties roll up into states, states into the US, and countries into the world
+region_hierarchy = RegionHierarchy()
+region_hierarchy.add_level('county', 'state',
+    lambda cases: us_registry.resolve(cases.labels.get('state', [])), parents=us_registry.names)
+region_hierarchy.add_level('state', 'country', lambda cases: ['us']*len(cases))
+region_hierarchy.add_level('country', 'world', lambda cases: ['world']*len(cases))
+
+#Named totals, including exclusion sets
+region_hierarchy.add_total('us', 'state', 'us')
+region_hierarchy.add_total('us without repatriated', 'state', 'us', exclude=repatriated_locations)
+region_hierarchy.add_total('world', 'country', 'world')
+region_hierarchy.add_total('world without mainland china', 'country', 'world', exclude=['mainland china'])
+
+#Hierarchy level of the regions in each dataset
+dataset_levels = {'us':'state', 'world':'country', 'counties':'county'}
+
+def dataset_totals(name, output, metric):
+    """Every named total of a loaded dataset for one metric, as {total name: series}.
+
+    Totals, and the level rollups they come from, are computed once and kept with the dataset, so they
+    last as long as that version of it.
+    """
+    totals = output.setdefault('totals', {})
+    if metric not in totals:
+        rollups = output.setdefault('rollups', {})
+        totals[metric] = {total:region_hierarchy.total(total, output['cases'], metric, rollups)
+                          for total in region_hierarchy.totals_for(dataset_levels[name])}
+    return totals[metric]
+
+def load_totals(name, metric, negative_daily=True, as_of=None, source=None):
+    """The named totals (see region_hierarchy) of the 'us' or 'world' dataset for one metric."""
+    return dataset_totals(name, load_dataset(name, negative_daily, as_of, source), metric)
+
+def load_summary(name, metric, negative_daily=True, as_of=None, source=None):
+    """Peak & latest value of every region of the 'us' or 'world' dataset for one metric (a RegionSummary).
+
+    The regions ordered by either, and their percentiles, are worked out once and kept with the dataset,
+    so every chart of the same version of it shares them.
+    """
+    output = load_dataset(name, negative_daily, as_of, source)
+    summaries = output.setdefault('summaries', {})
+    if metric not in summaries:
+        summaries[metric] = RegionSummary(output['cases'].series(metric), output['cases'].regions)
+    return summaries[metric]
+
+def load_smoothed(name, metric, method='trailing', window=7, negative_daily=True, as_of=None, source=None):
+    """A smoothed copy of one metric of the 'us' or 'world' dataset (see smoothing.methods).
+
+    Returns {'regions':(regions, dates) array, 'totals':{total name: series}}, kept with the dataset
+    so each method & window is only worked out once.
+    """
+    output = load_dataset(name, negative_daily, as_of, source)
+    smoothed = output.setdefault('smoothed', {})
+    key = (metric, method, window)
+    if key not in smoothed:
+        totals = dataset_totals(name, output, metric)
+        smoothed_totals = smoothing.smooth(np.array(list(totals.values())), method, window, output['dates'])
+        smoothed[key] = {
+            'regions':smoothing.smooth(output['cases'].series(metric), method, window, output['dates']),
+            'totals':dict(zip(totals.keys(), smoothed_totals))}
+    return smoothed[key]
+
+def load_doubling(name, metric, lag_days=7, method='endpoints', negative_daily=True, as_of=None, source=None):
+    """Doubling times of the 'us' or 'world' dataset for one metric, over every region and date.
+
+    lag_days is one window or a list of them, and method one of doubling.methods. Returns
+    {'regions':DoublingTimes over the case store's regions (by index), 'totals':DoublingTimes over its
+    named totals (by name)}, covering at least the requested windows, with lag_days (or its first
+    window) as their default. These are kept with the dataset; asking for a window not computed yet
+    recomputes all windows asked for so far in one pass.
+    """
+    output = load_dataset(name, negative_daily, as_of, source)
+    doubling = output.setdefault('doubling', {})
+    windows = sorted(set(np.atleast_1d(lag_days).tolist()))
+    key = (metric, method)
+    cached = doubling.get(key)
+    if cached is None or not set(windows) <= set(cached['regions'].windows):
+        if cached is not None: windows = sorted(set(windows) | set(cached['regions'].windows))
+        totals = dataset_totals(name, output, metric)
+        doubling[key] = {
+            'regions':DoublingTimes(output['cases'].series(metric), windows, method=method),
+            'totals':DoublingTimes(np.array(list(totals.values())), windows, list(totals.keys()), method)}
+
+    #The cached objects are shared, so each caller gets views defaulting to its own window
+    default = np.atleast_1d(lag_days)[0]
+    return {part:times.with_default(default) for part,times in doubling[key].items()}
+
+
+def load_rt(name, window=7, metric='daily', negative_daily=True, as_of=None, source=None):
+    """Reproduction numbers (Rt) of the 'us' or 'world' dataset, from a metric of new cases per day.
+
+    Returns {'regions':ReproductionNumbers over the case store's regions (by index),
+    'totals':ReproductionNumbers over its named totals (by name)}, kept with the dataset.
+    """
+    output = load_dataset(name, negative_daily, as_of, source)
+    rt = output.setdefault('rt', {})
+    key = (metric, window)
+    if key not in rt:
+        totals = dataset_totals(name, output, metric)
+        rt[key] = {
+            'regions':ReproductionNumbers(output['cases'].series(metric), window),
+            'totals':ReproductionNumbers(np.array(list(totals.values())), window, list(totals.keys()))}
+    return rt[key]
+
+#========================================================================================================
+# Incremental ingestion state
+#========================================================================================================
+
+#Bump this whenever the parsing above changes, so stale stored states are rebuilt
+ingest_state_version = 10
+
+def tables_hash():
+    """Hash of the contents of the hand-maintained tables applied during ingestion.
+
+    Corrections and populations end up in the stored states & snapshots, so editing either table
+    (even for a past date) has to invalidate them.
+    """
+    digest = hashlib.sha1()
+    for path in (corrections.table_path, world_populations_path):
         try:
-            df = df.groupby('Country/Region').sum()
-        except:
-            df = df.groupby('Country_Region').sum()
-
-        #Iterate through every country
-        for location,row in df.iterrows():
-
-            #Fix for country name changes
-            if location == 'Iran (Islamic Republic of)':
-                location = "Iran"
-            elif location in ['Republic of Korea','Korea, South']:
-                location = "South Korea"
-            elif location == 'Cruise Ship':
-                location = "Others"
-            elif location == 'China':
-                location = "Mainland China"
-            elif location == 'United Kingdom':
-                location = "UK"
-            elif location == 'occupied Palestinian territory':
-                location = "Palestine"
-            elif location in ['Taiwan*','Taipei and environs']:
-                location = "Taiwan"
-            elif location in ['Czechia']:
-                location = "Czech Republic"
-
-            #Add entry for this region if previously non-existent
-            if location.lower() not in cases.keys():
-                cases[location.lower()] = {'date':dates,
-                        'confirmed':[0 for i in range(len(dates))],
-                        'deaths':[0 for i in range(len(dates))],
-                        'recovered':[0 for i in range(len(dates))],
-                        'active':[0 for i in range(len(dates))],
-                        'daily':[0 for i in range(len(dates))]}
-
-            #Get index of date within list
-            idx = dates.index(start_date)
-
-            #Manually edit data points that are inaccurate due to CSSE server maintenance
-            #Source: https://www.worldometers.info/coronavirus/#countries
-            if start_date == dt.datetime(2020,3,12):
-                check_idx = dates.index(dt.datetime(2020,3,11))
-                check_difference = abs(int(row['Confirmed']) - cases[location.lower()]['confirmed'][check_idx])
-                if location.lower() == 'italy' and check_difference < 200:
-                    row['Confirmed'] = 15113
-                    row['Deaths'] = 1016
-                    row['Recovered'] = 1258
-                if location.lower() == 'france' and check_difference < 200:
-                    row['Confirmed'] = 2876
-                    row['Deaths'] = 61
-                    row['Recovered'] = 12
-                if location.lower() == 'spain' and check_difference < 200:
-                    row['Confirmed'] = 3146
-                    row['Deaths'] = 86
-                    row['Recovered'] = 189
-                if location.lower() == 'germany' and check_difference < 200:
-                    row['Confirmed'] = 2745
-                    row['Deaths'] = 6
-                    row['Recovered'] = 25
-
-            cases[location.lower()]['confirmed'][idx] += int(row['Confirmed'])
-            cases[location.lower()]['deaths'][idx] += int(row['Deaths'])
-            cases[location.lower()]['recovered'][idx] += int(row['Recovered'])
-            cases[location.lower()]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-            if idx == 0:
-                cases[location.lower()]['daily'][idx] = np.nan
-            elif location.lower() == 'mainland china' and strdate == '02-13-2020':
-                cases[location.lower()]['daily'][idx] = np.nan
-            else:
-                daily_change = cases[location.lower()]['confirmed'][idx] - cases[location.lower()]['confirmed'][idx-1]
-                if negative_daily == False and daily_change < 0: daily_change = 0
-                cases[location.lower()]['daily'][idx] = daily_change
-
-        #Increment date by 1 day
-        start_date += dt.timedelta(hours=24)
+            with open(path, 'rb') as f: digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b';')
+    return digest.hexdigest()
 
+def _ingest_state_path(name, negative_daily):
+    flag = 'negative' if negative_daily else 'nonnegative'
+    return os.path.join(csse_mirror.mirror_dir, f"ingest_{name}_{flag}.pkl")
 
-    return {'dates':dates,
-            'cases':cases}
+def load_ingest_state(name, negative_daily, dates, cases):
+    """Reuse the parsed series stored by the last run.
+
+    Returns (cases, n) where the first n entries of dates are already ingested. Only historic days
+    are reused; anything newer may have been revised, so it is parsed again. The stored case store is
+    truncated to those n days and zero-padded out to the full length of dates.
+    """
+    try:
+        with open(_ingest_state_path(name, negative_daily), 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return cases, 0
+    if state.get('version') != ingest_state_version or state.get('tables') != tables_hash(): return cases, 0
+
+    #Longest run of matching historic dates
+    n = 0
+    for old_date,new_date in zip(state['dates'], dates):
+        if old_date != new_date or not csse_mirror.is_historic(old_date): break
+        n += 1
+    if n == 0: return cases, 0
+
+    #Keep ingested days and make room for the new ones
+    stored = state['cases']
+    for key in cases.keys(): stored.add_region(key)
+    stored.set_dates(dates, keep=n)
+    return stored, n
+
+def save_ingest_state(name, negative_daily, dates, cases):
+    """Store the parsed series so the next run only has to ingest new days."""
+    state = {'version':ingest_state_version,
+             'tables':tables_hash(),
+             'dates':dates,
+             'cases':cases}
+    path = _ingest_state_path(name, negative_daily)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.part', 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.part', path)
 
 
 #US states list
@@ -512,3 +950,125 @@ def historic_deaths():
     ]
     return historic_deaths
 
+
+
+#========================================================================================================
+# Binary snapshots
+#========================================================================================================
+
+#Bump this whenever the snapshot layout changes
+snapshot_version = 1
+
+def _snapshot_dir(name, negative_daily, source='daily'):
+    flag = 'negative' if negative_daily else 'nonnegative'
+    return os.path.join(csse_mirror.mirror_dir, f"snapshot_{source}_{name}_{flag}")
+
+def source_signature(paths, negative_daily, source='daily'):
+    """Hash of the mirrored files (names, sizes, modification times), the parsing versions and the
+    contents of the corrections & populations tables."""
+    signature = hashlib.sha1(f"{snapshot_version}/{ingest_state_version}/{negative_daily}/{source}/{tables_hash()}".encode())
+    for date,path in paths.items():
+        stat = os.stat(path)
+        signature.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return signature.hexdigest()
+
+def save_snapshot(name, negative_daily, output, signature, source='daily'):
+    """Write a dataset as .npy arrays plus a JSON index of regions, dates and metrics."""
+    directory = _snapshot_dir(name, negative_daily, source)
+    os.makedirs(directory, exist_ok=True)
+    cases = output['cases']
+
+    #Remove the index first, so a half-written snapshot is never picked up
+    index_path = os.path.join(directory, 'index.json')
+    if os.path.exists(index_path): os.remove(index_path)
+
+    for array_name,array in [('counts',cases.counts), ('floats',cases.floats)]:
+        path = os.path.join(directory, f"{array_name}.npy")
+        with open(path + '.part', 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(path + '.part', path)
+
+    index = {'version':snapshot_version,
+             'signature':signature,
+             'dates':[date.strftime("%Y-%m-%d") for date in output['dates']],
+             'regions':list(cases.regions),
+             'count_metrics':list(cases.count_metrics),
+             'float_metrics':list(cases.float_metrics)}
+    with open(index_path + '.part', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.part', index_path)
+
+def load_snapshot(name, negative_daily, signature=None, source='daily'):
+    """Memory-map a stored dataset, or return None if there isn't one matching signature.
+
+    Arrays are opened read-only with mmap, so nothing is copied and pages are only read when used.
+    """
+    directory = _snapshot_dir(name, negative_daily, source)
+    try:
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != snapshot_version: return None
+    if signature is not None and index.get('signature') != signature: return None
+
+    try:
+        counts = np.load(os.path.join(directory, 'counts.npy'), mmap_mode='r')
+        floats = np.load(os.path.join(directory, 'floats.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    dates = [dt.datetime.strptime(date, "%Y-%m-%d") for date in index['dates']]
+    cases = CaseStore.from_arrays(dates, index['regions'], counts, floats,
+                                  index['count_metrics'], index['float_metrics'])
+    return {'dates':dates,
+            'cases':cases}
+
+def _county_snapshot_dir():
+    return os.path.join(csse_mirror.mirror_dir, "snapshot_counties")
+
+def save_county_snapshot(output, signature):
+    """Write the county store's arrays as .npy files plus a JSON index of regions, dates and labels."""
+    directory = _county_snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    cases = output['cases']
+
+    index_path = os.path.join(directory, 'index.json')
+    if os.path.exists(index_path): os.remove(index_path)
+
+    for array_name in ['start','offsets','values']:
+        path = os.path.join(directory, f"{array_name}.npy")
+        with open(path + '.part', 'wb') as f:
+            np.save(f, getattr(cases, array_name))
+        os.replace(path + '.part', path)
+
+    index = {'version':snapshot_version,
+             'signature':signature,
+             'dates':[date.strftime("%Y-%m-%d") for date in output['dates']],
+             'regions':list(cases.regions),
+             'metrics':list(cases.metrics),
+             'labels':{label:[str(x) for x in values] for label,values in cases.labels.items()}}
+    with open(index_path + '.part', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.part', index_path)
+
+def load_county_snapshot(signature=None):
+    """Memory-map the stored county dataset, or return None if there isn't one matching signature."""
+    directory = _county_snapshot_dir()
+    try:
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        arrays = {array_name:np.load(os.path.join(directory, f"{array_name}.npy"), mmap_mode='r')
+                  for array_name in ['start','offsets','values']}
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != snapshot_version: return None
+    if signature is not None and index.get('signature') != signature: return None
+
+    dates = [dt.datetime.strptime(date, "%Y-%m-%d") for date in index['dates']]
+    labels = {label:np.array(values) for label,values in index['labels'].items()}
+    if 'fips' in labels: labels['fips'] = pd.Categorical(labels['fips'])
+    cases = SparseCaseStore(dates, index['regions'], arrays['start'], arrays['offsets'], arrays['values'],
+                            index['metrics'], labels)
+    return {'dates':dates,
+            'cases':cases}
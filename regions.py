@@ -0,0 +1,89 @@
+#Import packages
+import numpy as np
+import pandas as pd
+
+class RegionRegistry:
+    """Canonical region names with a single alias hash index.
+
+    Every spelling a region has had (full name, abbreviation, historic CSSE names) maps to one integer
+    id. resolve() maps a whole column at once: each distinct string is looked up only once, and
+    anything worked out from the fallback rules is added to the alias index for next time.
+    """
+
+    def __init__(self, auto_add=False):
+        self.names = []
+        self.ids = {}
+        self.aliases = {}
+        self.contains_rules = []   #(substring, region) checked before the alias index
+        self.suffix_rule = False   #resolve "County, ST" by the part after the comma
+        self.date_rules = {}       #{date: [(substring, region)]} for one-off reports
+        self.auto_add = auto_add   #unknown names become new regions instead of -1
+
+    @staticmethod
+    def key(value):
+        return str(value).strip().lower()
+
+    #----------------------------------------------------------------------------------------------------
+    # Building the registry
+    #----------------------------------------------------------------------------------------------------
+
+    def add(self, name, aliases=()):
+        """Add a canonical region (if new) with any number of aliases, returning its id."""
+        name = self.key(name)
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        rid = self.ids[name]
+        for alias in (name,) + tuple(aliases): self.aliases[self.key(alias)] = rid
+        return rid
+
+    def add_contains_rule(self, substring, name):
+        self.contains_rules.append((self.key(substring), self.add(name)))
+
+    def add_date_rule(self, date, substring, name):
+        self.date_rules.setdefault(date, []).append((self.key(substring), self.add(name)))
+
+    #----------------------------------------------------------------------------------------------------
+    # Lookups
+    #----------------------------------------------------------------------------------------------------
+
+    def lookup(self, value, date=None):
+        """The id for one name, or -1 if it isn't a known region."""
+        key = self.key(value)
+        for substring,rid in self.date_rules.get(date, []):
+            if substring in key: return rid
+        if key in self.aliases: return self.aliases[key]
+
+        rid = -1
+        for substring,region in self.contains_rules:
+            if substring in key:
+                rid = region
+                break
+        if rid == -1 and self.suffix_rule and ',' in key:
+            rid = self.aliases.get(key.split(",")[1].replace(" ",""), -1)
+        if rid == -1 and self.auto_add and key not in ('','nan'):
+            rid = self.add(key)
+
+        #Remember the answer, so the rules only ever run once per spelling
+        self.aliases[key] = rid
+        return rid
+
+    def resolve(self, values, date=None):
+        """Integer ids for a whole column of names (-1 where unknown)."""
+        codes,uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        ids = np.array([self.lookup(value, date) for value in uniques] + [-1], dtype=np.int64)
+        return ids[codes]   #code -1 (missing value) picks the trailing -1
+
+    def store_ids(self, cases, ids, add=False):
+        """Map registry ids onto the region ids of a case store (-1 where the store lacks the region).
+
+        With add=True, regions not yet in the store are added to it.
+        """
+        uniques,inverse = np.unique(ids, return_inverse=True)
+        mapped = np.full(len(uniques), -1, dtype=np.int64)
+        for i,rid in enumerate(uniques):
+            if rid < 0: continue
+            name = self.names[rid]
+            if add: mapped[i] = cases.add_region(name)
+            else: mapped[i] = cases.region_index.get(name, -1)
+        return mapped[inverse.reshape(-1)]
@@ -0,0 +1,106 @@
+#Import packages
+import numpy as np
+from statistics import NormalDist
+
+#Serial interval (days from one case's symptoms to the next): gamma with this mean & standard deviation
+serial_interval_mean = 4.7
+serial_interval_sd = 2.9
+
+#Gamma prior on Rt, and the fewest new cases over a window worth estimating from
+prior_mean = 5
+prior_sd = 5
+min_cases = 12
+
+def serial_interval(mean=serial_interval_mean, sd=serial_interval_sd, max_days=None):
+    """Discretized serial interval w[s], the share of onward cases s days after a case (w[0] = 0, sum 1).
+
+    Day s gets the gamma probability between s-0.5 and s+0.5 days, integrated numerically so no
+    special functions are needed.
+    """
+    if max_days is None: max_days = int(np.ceil(mean + 5*sd))
+    shape = (mean/sd)**2; scale = sd**2/mean
+    x = np.linspace(0, max_days+0.5, 100*(max_days+1)+1)
+    with np.errstate(divide='ignore'):
+        density = np.where(x > 0, np.exp((shape-1)*np.log(x) - x/scale), 0)
+    cdf = np.concatenate([[0], np.cumsum((density[1:]+density[:-1])/2)])
+    w = np.diff(np.concatenate([[0], np.interp(np.arange(max_days+1)+0.5, x, cdf)]))
+    w[0] = 0
+    return w/w.sum()
+
+def incidence(series):
+    """New cases per day as a float64 array, with missing & negative days (report corrections) as 0."""
+    values = np.asarray(series, dtype=np.float64)
+    return np.where(np.isnan(values) | (values < 0), 0, values)
+
+def infectiousness(cases, w):
+    """Total infectiousness on every date: sum over s of w[s] times the new cases s days before.
+
+    The kernel is applied to every region at once, one shifted add per day of the serial interval.
+    """
+    cases = np.asarray(cases, dtype=np.float64)
+    total = np.zeros_like(cases)
+    for s in range(1, min(len(w), cases.shape[-1])):
+        total[...,s:] += w[s]*cases[...,:-s]
+    return total
+
+def _window_totals(values, window):
+    #Sum of the `window` days up to every date, from one cumulative sum
+    sums = np.concatenate([np.zeros(values.shape[:-1]+(1,)), np.cumsum(values, axis=-1)], axis=-1)
+    sums[...,window:] = sums[...,window:] - sums[...,:-window]
+    return sums[...,1:]
+
+def gamma_quantile(q, shape, rate):
+    """Approximate q-quantile of a gamma distribution (Wilson-Hilferty), over arrays of parameters."""
+    z = NormalDist().inv_cdf(q)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cube = np.maximum(1 - 1/(9*shape) + z/(3*np.sqrt(shape)), 0)**3
+    return shape*cube/rate
+
+
+class ReproductionNumbers:
+    """Rt of many regions over every date, estimated in one pass (Cori et al. 2013).
+
+    Over the `window` days up to every date, new cases are compared with the infectiousness left by
+    earlier cases (their convolution with the serial interval). With a gamma prior, Rt's posterior is
+    gamma too: mean[i, t] is its mean, lower & upper the bounds of its central `interval`. cases[i, t]
+    is the mean new cases per day over the window. Dates with fewer than min_cases new cases in the
+    window (or without a full window) are NaN. Regions can be looked up by index or, if names are
+    given, by name.
+    """
+
+    def __init__(self, series, window=7, names=None, interval=0.95, w=None, min_cases=min_cases):
+        self.window = int(window)
+        self.names = {name:i for i,name in enumerate(names)} if names is not None else {}
+        self.w = w if w is not None else serial_interval()
+        new_cases = np.atleast_2d(incidence(series))
+
+        #Posterior gamma shape & rate of every region & date
+        window_cases = _window_totals(new_cases, self.window)
+        window_infectiousness = _window_totals(infectiousness(new_cases, self.w), self.window)
+        self.shape = (prior_mean/prior_sd)**2 + window_cases
+        self.rate = prior_mean/prior_sd**2 + window_infectiousness
+
+        valid = (window_cases >= min_cases) & (window_infectiousness > 0)
+        valid[:,:self.window] = False
+        self.valid = valid
+        self.cases = window_cases/self.window
+        self.mean = np.where(valid, self.shape/self.rate, np.nan)
+        self.lower = np.where(valid, gamma_quantile((1-interval)/2, self.shape, self.rate), np.nan)
+        self.upper = np.where(valid, gamma_quantile((1+interval)/2, self.shape, self.rate), np.nan)
+
+    def _index(self, region):
+        return self.names[region] if region in self.names else region
+
+    def current(self):
+        """Rt of every region on the last date, as (mean, lower, upper, valid)."""
+        return self.mean[:,-1], self.lower[:,-1], self.upper[:,-1], self.valid[:,-1]
+
+    def trail(self, region):
+        """A region's Rt and mean new cases per day over its run of estimable dates up to the last one.
+
+        Returns (rt, cases), both ending on the last date; empty if the last date isn't estimable.
+        """
+        idx = self._index(region)
+        invalid = np.flatnonzero(~self.valid[idx])
+        start = invalid[-1]+1 if len(invalid) > 0 else 0
+        return self.mean[idx,start:], self.cases[idx,start:]
@@ -0,0 +1,95 @@
+#Import packages
+import numpy as np
+import pandas as pd
+
+#Smoothing methods, with the chart title suffix of each (n is the window in days)
+methods = {
+    'trailing':"{n}-Day Average",
+    'centered':"Centered {n}-Day Average",
+    'weekday':"Weekday-Adjusted",
+    'ewma':"{n}-Day Exponential Average",
+}
+
+def _window_sums(series, window):
+    #Sums & counts of the non-NaN values in the `window` days up to every date, from one cumulative sum each
+    values = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    valid = ~np.isnan(values)
+    pad = np.zeros(values.shape[:-1]+(1,))
+    sums = np.concatenate([pad, np.cumsum(np.where(valid, values, 0), axis=-1)], axis=-1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=-1)], axis=-1)
+    sums[...,window:] = sums[...,window:] - sums[...,:-window]
+    counts[...,window:] = counts[...,window:] - counts[...,:-window]
+    return sums[...,1:], counts[...,1:]
+
+def trailing_mean(series, window=7, min_periods=None):
+    """Mean of the `window` days up to and including every date, over a (regions, dates) array.
+
+    NaN values are skipped; dates with fewer than min_periods values in their window (default: the
+    whole window) are NaN. A single series gives a single series back.
+    """
+    if min_periods is None: min_periods = window
+    sums,counts = _window_sums(series, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(counts >= max(min_periods,1), sums/counts, np.nan)
+    return means if np.ndim(series) > 1 else means[0]
+
+def centered_mean(series, window=7, min_periods=None):
+    """Mean of the `window` days centered on every date (see trailing_mean).
+
+    For even windows the extra day comes before the date. Without min_periods, the last (window-1)//2
+    dates are NaN, since their window isn't complete yet.
+    """
+    values = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    shift = (window-1)//2
+    padded = np.concatenate([values, np.full(values.shape[:-1]+(shift,), np.nan)], axis=-1)
+    means = trailing_mean(padded, window, min_periods)[...,shift:]
+    return means if np.ndim(series) > 1 else means[0]
+
+def weekdays(dates):
+    """Day of the week (Monday = 0) of every date."""
+    return np.array([date.weekday() for date in dates], dtype=np.int64)
+
+def weekday_factors(series, dates, window=7):
+    """How far above or below its centered `window`-day mean every region runs on each day of the week.
+
+    Returns a (regions, 7) array of factors averaging 1 across the week, indexed by weekday; regions
+    without enough data to tell get 1 everywhere.
+    """
+    values = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = values / centered_mean(values, window)
+    valid = np.isfinite(ratios)
+
+    #Mean ratio per weekday, summed for all regions at once
+    days = weekdays(dates)
+    sums = np.zeros((values.shape[0], 7)); counts = np.zeros((values.shape[0], 7))
+    np.add.at(sums.T, days, np.where(valid, ratios, 0).T)
+    np.add.at(counts.T, days, valid.T)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = sums/counts
+        factors = factors / factors.mean(axis=1, keepdims=True)
+    factors[~np.isfinite(factors).all(axis=1) | (factors <= 0).any(axis=1)] = 1
+    return factors
+
+def remove_weekday_effect(series, dates, window=7):
+    """Divide out every region's day-of-week reporting pattern (see weekday_factors)."""
+    values = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    adjusted = values / weekday_factors(values, dates, window)[:,weekdays(dates)]
+    return adjusted if np.ndim(series) > 1 else adjusted[0]
+
+def ewma(series, span=7):
+    """Exponentially weighted moving average along the dates, with smoothing factor 2/(span+1).
+
+    NaN values are skipped rather than reset the average.
+    """
+    values = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    means = pd.DataFrame(values.T).ewm(span=span, ignore_na=True).mean().to_numpy().T
+    return means if np.ndim(series) > 1 else means[0]
+
+def smooth(series, method='trailing', window=7, dates=None):
+    """Smooth a (regions, dates) array with one of the methods above; 'weekday' needs the dates."""
+    if method == 'trailing': return trailing_mean(series, window)
+    if method == 'centered': return centered_mean(series, window)
+    if method == 'weekday': return remove_weekday_effect(series, dates, window)
+    if method == 'ewma': return ewma(series, window)
+    raise ValueError(f"Unknown smoothing method '{method}'; expected one of {', '.join(methods)}")